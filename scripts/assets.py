@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+# Content-addressed asset store for the note converter (--hash-assets).
+#
+# Every attachment is stored once as `<hash><ext>` in the store folder, however
+# many names or folders it appears under, and links in the converted notes are
+# rewritten to the hashed name. A hashed name never changes content, so the
+# store can be served with IMMUTABLE_CACHE_CONTROL (preview.py does).
+#
+#   python scripts/assets.py _notes slides       # report duplicate assets
+
+HASH_LENGTH = 16
+MANIFEST_NAME = "_manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Files that are pages rather than assets; links to them are left alone
+NOTE_EXTENSIONS = {'.md', '.qmd', '.rmd', '.markdown', '.ipynb', '.html'}
+FIGURE_FORMATS = {'.pdf', '.png', '.svg', '.webp', '.gif', '.jpg', '.jpeg'}
+
+# Link targets in markdown `](...)`, allowing one level of parentheses as in
+# `YourFile%20(3).png`, and in HTML src/href attributes.
+MD_LINK = re.compile(r"(\]\()((?:[^()\s]|\([^()\s]*\))+)")
+HTML_LINK = re.compile(r"""(\b(?:src|href)=["'])([^"']+)""")
+EXTERNAL = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|/|#)", re.IGNORECASE)
+CODE_FENCE = re.compile(r"^\s*(```|~~~)")
+
+def file_blocks(path, block_bytes=1024 * 1024):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(block_bytes), b"")
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    for block in file_blocks(path):
+        sha.update(block)
+    return sha.hexdigest()
+
+class AssetStore:
+    """
+    Stores files from under `source_root` in `store_dir` by content hash.
+    Hashes are kept in a manifest beside the blobs and reused while a file's
+    size and mtime are unchanged. New blobs and the manifest are written
+    through `writer` (an AtomicWriter), so they land with the notes.
+    """
+    def __init__(self, store_dir, source_root, writer):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.source_root = Path(source_root)
+        self.writer = writer
+        self.manifest_path = self.store_dir / MANIFEST_NAME
+        self.known = {}
+        if self.manifest_path.exists():
+            try:
+                self.known = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+            except ValueError:
+                pass
+        self.manifest = {}
+        self.written = set()
+
+    def add(self, path):
+        """
+        Stores `path` unless its content is already there; returns the hashed name.
+        """
+        key = Path(os.path.relpath(path, self.source_root)).as_posix()
+        if key in self.manifest:
+            return self.manifest[key]["name"]
+
+        stat = os.stat(path)
+        entry = self.known.get(key)
+        if not entry or entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+            name = file_hash(path)[:HASH_LENGTH] + Path(path).suffix.lower()
+            entry = {"name": name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        self.manifest[key] = entry
+
+        blob = self.store_dir / entry["name"]
+        if entry["name"] not in self.written and not blob.exists():
+            self.writer.write(blob, file_blocks(path))
+            self.written.add(entry["name"])
+        return entry["name"]
+
+    def add_folder(self, folder):
+        for root, _, files in os.walk(folder):
+            for file in sorted(files):
+                self.add(Path(root) / file)
+
+    def rewrite_lines(self, lines, source_dir, dest_dir):
+        """
+        Points local asset links in `lines` at the store, relative to the
+        folder the note is written to. Code blocks are left as they are.
+        Pieces of a cut-up long line (`continued`) never open or close one.
+        """
+        prefix = Path(os.path.relpath(self.store_dir, dest_dir)).as_posix()
+
+        def replace(m):
+            target = m.group(2)
+            if EXTERNAL.match(target):
+                return m.group(0)
+            path = Path(source_dir) / unquote(target)
+            if path.suffix.lower() in NOTE_EXTENSIONS or not path.is_file():
+                return m.group(0)
+            return m.group(1) + quote(f"{prefix}/{self.add(path)}")
+
+        in_code = False
+        for line in lines:
+            if CODE_FENCE.match(line) and not getattr(line, "continued", False):
+                in_code = not in_code
+            elif not in_code and ("](" in line or "=" in line):
+                line = HTML_LINK.sub(replace, MD_LINK.sub(replace, line))
+            yield line
+
+    def save(self, partial=False):
+        """
+        Writes the manifest of files seen this run; a `partial` run keeps
+        the entries of files it didn't see. Blobs are never removed, since
+        pages cached elsewhere may still point at them.
+        """
+        manifest = dict(self.known, **self.manifest) if partial else self.manifest
+        content = json.dumps(dict(sorted(manifest.items())), indent=2, ensure_ascii=False) + "\n"
+        if self.manifest_path.exists() and self.manifest_path.read_text(encoding='utf-8') == content:
+            return
+        self.writer.write(self.manifest_path, [content.encode('utf-8')])
+
+def duplicate_groups(folders):
+    """
+    Groups the asset files under `folders` by content. Returns the groups with
+    more than one member as (size, [paths]), largest waste first.
+    """
+    # Only files of equal size can match, so most files are never hashed
+    by_size = {}
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if not d.startswith((".", "_")) and d != "__pycache__"]
+            for file in files:
+                path = Path(root) / file
+                if path.suffix.lower() in NOTE_EXTENSIONS or path.suffix == ".py":
+                    continue
+                by_size.setdefault(path.stat().st_size, []).append(path)
+
+    groups = []
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        by_hash = {}
+        for path in paths:
+            by_hash.setdefault(file_hash(path), []).append(path)
+        groups.extend((size, sorted(same)) for same in by_hash.values() if len(same) > 1)
+    return sorted(groups, key=lambda g: g[0] * (len(g[1]) - 1), reverse=True)
+
+def format_variants(folders):
+    """
+    Figures kept in several formats (same folder and stem). These differ in
+    content, so the store can't merge them; the report shows which variants
+    no page links to.
+    """
+    variants = {}
+    linked = set()
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if not d.startswith((".", "_")) and d != "__pycache__"]
+            for file in files:
+                path = Path(root) / file
+                suffix = path.suffix.lower()
+                if suffix in FIGURE_FORMATS:
+                    variants.setdefault(path.with_suffix(""), []).append(path)
+                elif suffix in NOTE_EXTENSIONS and not file.startswith("_"):
+                    text = path.read_text(encoding='utf-8', errors='replace')
+                    for m in MD_LINK.finditer(text):
+                        linked.add((path.parent / unquote(m.group(2))).resolve())
+    return [(sorted(paths), {p for p in paths if p.resolve() in linked})
+            for stem, paths in sorted(variants.items()) if len(paths) > 1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Report duplicate assets that a content-addressed store would merge.")
+    parser.add_argument("folders", nargs="+", help="Folders to scan")
+
+    args = parser.parse_args()
+
+    groups = duplicate_groups(args.folders)
+    wasted = 0
+    for size, paths in groups:
+        wasted += size * (len(paths) - 1)
+        print(f"{len(paths)} copies, {size / 1024:.0f} KiB each:")
+        for path in paths:
+            print(f"    {path}")
+    print(f"--- {len(groups)} duplicated assets, {wasted / 1024:.0f} KiB stored more than once. ---")
+
+    variants = format_variants(args.folders)
+    if variants:
+        print("Figures kept in several formats (* = linked from a page):")
+        for paths, used in variants:
+            print("    " + "  ".join(f"{p}{'*' if p in used else ''}" for p in paths))
+
+if __name__ == "__main__":
+    main()
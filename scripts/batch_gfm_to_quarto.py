@@ -1,5 +1,9 @@
 import os
 import re
+import mmap
+import json
+import hashlib
+import tempfile
 import argparse
 from pathlib import Path
 
@@ -12,23 +16,97 @@ LIST_MARKER = re.compile(r"^(\s*)([-*+]|\d+\.)\s+")
 HEADER_MARKER = re.compile(r"^#+\s+")
 CODE_FENCE = re.compile(r"^\s*```")
 MERMAID = re.compile(r"^\s*```mermaid\b")
+FRONTMATTER_KEY = re.compile(r"^([A-Za-z0-9_-]+):\s*(.*)$")
 
-def convert_callouts(text):
+# Notes bigger than this are memory-mapped and streamed instead of read whole
+LARGE_FILE_BYTES = 32 * 1024 * 1024
+BLOCK_BYTES = 1024 * 1024
+# Streamed lines longer than this (an inlined base64 image) are cut into
+# segments, and a streamed note's frontmatter is only looked for this far
+SEGMENT_BYTES = BLOCK_BYTES
+HEAD_BYTES = 64 * 1024
+# What str.splitlines() splits on besides "\n"
+LINE_BREAKS = "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+LINE_BREAK_BYTES = [c.encode('utf-8') for c in LINE_BREAKS]
+
+# Metadata index of every converted note, kept next to the converted notes.
+# Quarto ignores files starting with an underscore.
+INDEX_NAME = "_index.json"
+INDEX_FIELDS = ("title", "date", "tags", "categories", "draft")
+
+# YAML 1.2 booleans, as Quarto reads them (yes/no stay strings)
+BOOLEANS = {"true": True, "True": True, "TRUE": True, "false": False, "False": False, "FALSE": False}
+
+def parse_scalar(value):
+    value = value.strip()
+    if value in BOOLEANS:
+        return BOOLEANS[value]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    if value.startswith("[") and value.endswith("]"):
+        return [parse_scalar(v) for v in value[1:-1].split(",") if v.strip()]
+    return value
+
+def split_frontmatter(text):
     """
-    Transforms GFM blockquote callouts to Quarto div callouts.
+    Splits a note into its YAML frontmatter (as a dict) and body.
+    Only the flat subset used by notes is understood: `key: value`,
+    inline `[a, b]` lists and `- item` block lists.
     """
     lines = text.splitlines()
-    output_lines = []
-    
+    if not lines or lines[0].strip() != "---":
+        return {}, text
+
+    meta = {}
+    last_key = None
+    for i, line in enumerate(lines[1:], start=1):
+        if line.strip() in ("---", "..."):
+            return meta, "\n".join(lines[i + 1:])
+        match = FRONTMATTER_KEY.match(line)
+        if match:
+            last_key = match.group(1)
+            meta[last_key] = parse_scalar(match.group(2)) if match.group(2) else []
+        elif line.strip().startswith("- ") and last_key is not None:
+            if not isinstance(meta[last_key], list):
+                meta[last_key] = []
+            meta[last_key].append(parse_scalar(line.strip()[2:]))
+
+    # No closing fence: not frontmatter after all
+    return {}, text
+
+def index_fields(meta):
+    entry = {field: meta[field] for field in INDEX_FIELDS if field in meta}
+    if isinstance(entry.get("tags"), str):
+        entry["tags"] = [entry["tags"]]
+    return entry
+
+def note_metadata(content):
+    """
+    Compact index entry for a converted note.
+    """
+    meta, body = split_frontmatter(content)
+    entry = index_fields(meta)
+    entry["words"] = len(body.split())
+    entry["hash"] = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return entry
+
+def callout_lines(lines):
+    """
+    Transforms GFM blockquote callouts to Quarto div callouts, line by line.
+    """
     in_callout = False
     
     for line in lines:
+        if isinstance(line, Segment):
+            yield line
+            continue
+
         match = CALLOUT_START.match(line)
         
         # 1. Start of a callout
         if match:
             if in_callout:
-                output_lines.append(":::")
+                yield ":::"
             
             callout_type = match.group(1).lower()
             callout_title = match.group(2).strip()
@@ -38,7 +116,7 @@ def convert_callouts(text):
             else:
                 header = f"::: {{.callout-{callout_type}}}"
             
-            output_lines.append(header)
+            yield header
             in_callout = True
             continue
             
@@ -50,49 +128,56 @@ def convert_callouts(text):
                 content = line.lstrip(">")
                 if content.startswith(" "):
                     content = content[1:]
-                output_lines.append(content)
+                yield content
             else:
                 # End of callout
-                output_lines.append(":::")
+                yield ":::"
                 in_callout = False
-                output_lines.append(line)
+                yield line
         
         # 3. Normal text
         else:
-            output_lines.append(line)
+            yield line
 
     if in_callout:
-        output_lines.append(":::")
-
-    return "\n".join(output_lines)
+        yield ":::"
 
-def convert_mermaid_block(text):
+def convert_callouts(text):
     """
-    Converts a mermaid block (```mermaid)
-    into an executable mermaid block (```{mermaid})
+    Transforms GFM blockquote callouts to Quarto div callouts.
     """
-    lines = text.splitlines()
-    output_lines = []
-    in_code_block = False
+    return "\n".join(callout_lines(text.splitlines()))
 
-    for i, line in enumerate(lines):
-        if MERMAID.match(line):
-            output_lines.append("```{mermaid}")
+def mermaid_lines(lines):
+    replaced = False
+    for line in lines:
+        if isinstance(line, Segment):
+            # The rest of a replaced fence line goes with it
+            if not replaced:
+                yield line
+        elif MERMAID.match(line):
+            replaced = True
+            yield "```{mermaid}"
         else:
-            output_lines.append(line)
-
-    return "\n".join(output_lines)
+            replaced = False
+            yield line
 
-def ensure_header_spacing(text):
+def convert_mermaid_block(text):
     """
-    Ensure empty lines exist before headers (#).
-    Ignores headers inside code blocks.
+    Converts a mermaid block (```mermaid)
+    into an executable mermaid block (```{mermaid})
     """
-    lines = text.splitlines()
-    output_lines = []
+    return "\n".join(mermaid_lines(text.splitlines()))
+
+def header_spacing_lines(lines):
+    prev = None
     in_code_block = False
 
-    for i, line in enumerate(lines):
+    for line in lines:
+        if isinstance(line, Segment):
+            yield line
+            continue
+
         # Toggle code block state
         if CODE_FENCE.match(line):
             in_code_block = not in_code_block
@@ -100,24 +185,29 @@ def ensure_header_spacing(text):
         # Check for header
         if not in_code_block and HEADER_MARKER.match(line):
             # If output is not empty and previous line is not empty, add newline
-            if output_lines and output_lines[-1].strip() != "":
-                output_lines.append("")
-        
-        output_lines.append(line)
+            if prev is not None and prev.strip() != "":
+                yield ""
         
-    return "\n".join(output_lines)
+        yield line
+        prev = line
 
-def ensure_list_spacing(text):
+def ensure_header_spacing(text):
     """
-    Ensure empty lines exist before the START of a list.
-    Ignores lists inside code blocks.
+    Ensure empty lines exist before headers (#).
+    Ignores headers inside code blocks.
     """
-    lines = text.splitlines()
-    output_lines = []
+    return "\n".join(header_spacing_lines(text.splitlines()))
+
+def list_spacing_lines(lines):
+    prev = None
     in_code_block = False
     in_list_block = False
 
-    for i, line in enumerate(lines):
+    for line in lines:
+        if isinstance(line, Segment):
+            yield line
+            continue
+
         # Toggle code block state
         if CODE_FENCE.match(line):
             in_code_block = not in_code_block
@@ -129,8 +219,8 @@ def ensure_list_spacing(text):
                 # If we were NOT in a list block previously, this is the first item
                 if not in_list_block:
                     # If previous line exists and is not empty, insert newline
-                    if output_lines and output_lines[-1].strip() != "":
-                        output_lines.append("")
+                    if prev is not None and prev.strip() != "":
+                        yield ""
                 in_list_block = True
             elif line.strip() == "":
                 # Empty line keeps us in "neutral", usually resets list context in markdown
@@ -139,47 +229,411 @@ def ensure_list_spacing(text):
                 # Text line breaks the list context
                 in_list_block = False
 
-        output_lines.append(line)
+        yield line
+        prev = line
+
+def ensure_list_spacing(text):
+    """
+    Ensure empty lines exist before the START of a list.
+    Ignores lists inside code blocks.
+    """
+    return "\n".join(list_spacing_lines(text.splitlines()))
+
+def resplit(lines):
+    """
+    What "\\n".join(lines).splitlines() would give: a trailing empty line
+    is dropped. Each text-level transform re-splits its input this way.
+    """
+    pending = None
+    for line in lines:
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+def converted_lines(lines):
+    """
+    The whole transform chain as one lazy pipeline over lines.
+    """
+    lines = resplit(callout_lines(lines))
+    lines = resplit(mermaid_lines(lines))
+    lines = resplit(header_spacing_lines(lines))
+    return list_spacing_lines(lines)
+
+class Segment(str):
+    """
+    A piece of an over-long line after its first, from region_lines(). It is
+    joined to the piece before it without a newline. The line transforms only
+    look at the start of a line, so they pass segments through untouched
+    (a callout title is taken from the first piece).
+    """
+    continued = True
+
+def segment_end(mm, pos, limit):
+    """
+    Where to cut a line that runs past `limit`. After the last other line
+    break in mm[pos:limit] if there is one, so every line starts a segment;
+    else after the last space in its second half, so words stay whole; else
+    at the last character boundary. Never between "\\r" and "\\n".
+    """
+    window = mm[pos:limit]
+    cut = 0
+    for brk in LINE_BREAK_BYTES:
+        found = window.rfind(brk)
+        if found != -1:
+            cut = max(cut, found + len(brk))
+    if cut == 0:
+        cut = window.rfind(b" ", len(window) // 2) + 1
+    if cut > 0 and not (window[cut - 1] == ord("\r") and mm[pos + cut] == ord("\n")):
+        return pos + cut
+    cut = limit
+    while mm[cut] & 0xC0 == 0x80:
+        cut -= 1
+    if mm[cut - 1] == ord("\r"):
+        cut -= 1
+    return cut
+
+def region_lines(mm, start, end):
+    """
+    Yields the lines of mm[start:end] one at a time, split the same way
+    str.splitlines() would. Lines longer than SEGMENT_BYTES come out as a
+    str followed by Segments, so no more than that is decoded at once.
+    """
+    pos = start
+    released = start - start % mmap.PAGESIZE
+    continued = False
+    while pos < end:
+        limit = min(end, pos + SEGMENT_BYTES)
+        newline = mm.find(b"\n", pos, limit)
+        if newline != -1:
+            stop = newline + 1
+        elif limit == end:
+            stop = end
+        else:
+            stop = segment_end(mm, pos, limit)
+        text = mm[pos:stop].decode('utf-8')
+        lines = text.splitlines() or [""]
+        if continued:
+            # The first line finishes the one cut off before it
+            if lines[0]:
+                lines[0] = Segment(lines[0])
+            else:
+                del lines[0]
+        yield from lines
+        continued = stop < end and text[-1] not in "\n" + LINE_BREAKS
+        pos = stop
+        # Drop pages already consumed so they don't count towards RSS
+        done = pos - pos % mmap.PAGESIZE
+        if done - released >= BLOCK_BYTES:
+            mm.madvise(mmap.MADV_DONTNEED, released, done - released)
+            released = done
+
+def mapped_lines(path):
+    """
+    Yields the lines of a file one at a time through a read-only memory map.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from region_lines(mm, 0, len(mm))
+
+class NoteStats:
+    """
+    Builds a note's metadata index entry while its lines stream past,
+    matching what note_metadata() gives for the joined text. Only the
+    frontmatter is kept, and only up to `head_bytes`; a longer one is
+    treated as no frontmatter.
+    """
+    def __init__(self, head_bytes=HEAD_BYTES):
+        self.sha = hashlib.sha256()
+        self.words = 0
+        self.head = []
+        self.head_size = 0
+        self.head_bytes = head_bytes
+        self.head_words = 0
+        self.closed = False
+        self.first = True
+        self.last = ""
+
+    def feed(self, lines):
+        for line in lines:
+            continued = isinstance(line, Segment)
+            self.sha.update((line if self.first or continued else "\n" + line).encode('utf-8'))
+            self.first = False
+            words = len(line.split())
+            if continued and not self.last.isspace() and not line[0].isspace():
+                # A word cut in two by segmenting counts once
+                words -= 1
+            self.words += words
+            self.last = line[-1:] or " "
+            if self.head is not None and not self.closed:
+                self.collect(line, words)
+            yield line
+
+    def collect(self, line, words):
+        self.head_size += len(line.encode('utf-8')) + 1
+        if self.head_size > self.head_bytes or (not self.head and line.strip() != "---"):
+            self.head = None
+            return
+        if isinstance(line, Segment):
+            self.head[-1] += line
+        else:
+            self.head.append(line)
+        self.head_words += words
+        self.closed = len(self.head) > 1 and self.head[-1].strip() in ("---", "...")
+
+    def entry(self):
+        meta, words = {}, self.words
+        if self.closed:
+            meta, _ = split_frontmatter("\n".join(self.head))
+            words -= self.head_words
+        entry = index_fields(meta)
+        entry["words"] = words
+        entry["hash"] = self.sha.hexdigest()
+        return entry
+
+def encoded_blocks(lines, block_bytes=BLOCK_BYTES):
+    """
+    Joins lines with newlines (no trailing one, like the in-memory path) and
+    yields the UTF-8 output in blocks of roughly block_bytes.
+    """
+    buf = []
+    size = 0
+    first = True
+    for line in lines:
+        data = (line if first or isinstance(line, Segment) else "\n" + line).encode('utf-8')
+        first = False
+        buf.append(data)
+        size += len(data)
+        if size >= block_bytes:
+            yield b"".join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield b"".join(buf)
+
+def matches_file(blocks, path):
+    """
+    True if the blocks equal the file's bytes. Stops reading at the first
+    differing block.
+    """
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        for block in blocks:
+            if f.read(len(block)) != block:
+                return False
+        return f.read(1) == b""
+
+class AtomicWriter:
+    """
+    Crash-safe output writes. Each file goes to a hidden temp file next to
+    its destination; commit() then fsyncs the temp files, renames them into
+    place and fsyncs each touched directory once. An interrupted run leaves
+    the old outputs intact plus stray temp files, which the next run removes.
+    """
+    TEMP_SUFFIX = ".tmp"
+
+    def __init__(self):
+        self.pending = []
+        umask = os.umask(0)
+        os.umask(umask)
+        self.mode = 0o666 & ~umask
+
+    @classmethod
+    def clean(cls, folder):
+        for root, _, files in os.walk(folder):
+            for file in files:
+                if file.startswith(".") and file.endswith(cls.TEMP_SUFFIX):
+                    os.remove(os.path.join(root, file))
 
-    return "\n".join(output_lines)
+    def write(self, path, blocks):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=self.TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in blocks:
+                    f.write(block)
+            os.chmod(tmp, self.mode)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.pending.append((tmp, path))
 
-def process_file(source_path, dest_path):
+    def commit(self):
+        for tmp, _ in self.pending:
+            with open(tmp, 'rb') as f:
+                os.fsync(f.fileno())
+        dirs = set()
+        for tmp, path in self.pending:
+            os.replace(tmp, path)
+            dirs.add(path.parent)
+        self.pending = []
+
+        # Directory fsync makes the renames durable; not available on Windows
+        if hasattr(os, "O_DIRECTORY"):
+            for folder in dirs:
+                fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+def process_large_file(source_path, dest_path, writer, known_hash=None, assets=None, member=None):
+    """
+    process_file() for notes too big to hold in memory. The source is
+    memory-mapped and converted line by line, and the destination is
+    compared block by block, so peak memory is bounded by the longest line.
+    """
+    def note_lines():
+        source = region_lines(*member.region()) if member is not None else mapped_lines(source_path)
+        lines = converted_lines(source)
+        if assets is not None:
+            lines = assets.rewrite_lines(lines, Path(source_path).parent, Path(dest_path).parent)
+        return lines
+
+    stats = NoteStats()
+    blocks = encoded_blocks(stats.feed(note_lines()))
+    if known_hash is not None and dest_path.exists():
+        # Hashing the stream is enough, the destination is never read
+        for _ in blocks:
+            pass
+        if stats.entry()["hash"] == known_hash:
+            return stats.entry()
+    elif matches_file(blocks, dest_path):
+        return stats.entry()
+
+    # Differs: run the pipeline again, this time writing it out
+    stats = NoteStats()
+    writer.write(dest_path, encoded_blocks(stats.feed(note_lines())))
+
+    print(f"Processed: {Path(source_path).name} -> {Path(dest_path).name}")
+    return stats.entry()
+
+def process_file(source_path, dest_path, prerender_dir=None, writer=None, known_hash=None, assets=None,
+                 member=None):
     """
     Reads source, applies transformations, writes to dest.
+    With prerender_dir, math and mermaid are rendered to SVGs there.
+    With `assets` (an AssetStore), linked attachments go into the store and
+    the links are rewritten to their hashed names.
+    Writes go through `writer` (committed by the caller) or, without one,
+    are committed right away. The writer also creates dest's folder.
+    `known_hash` is the hash recorded for dest in the last index; when
+    given, dest is not read back for change detection.
+    With `member` (from a VaultPack) the note is read from the pack, and
+    source_path only names it.
+    Returns the note's metadata index entry, or None on failure.
     """
+    own_writer = writer is None
+    if own_writer:
+        writer = AtomicWriter()
+
     try:
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        dest_path = Path(dest_path)
 
-        with open(source_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # Prerendering needs the whole text, so large notes skip it and keep
+        # client-side math.
+        size = member.length if member is not None else os.path.getsize(source_path)
+        if size > LARGE_FILE_BYTES:
+            metadata = process_large_file(source_path, dest_path, writer, known_hash, assets, member)
+            if own_writer:
+                writer.commit()
+            return metadata
+
+        if member is not None:
+            content = member.text()
+        else:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                content = f.read()
 
         content = convert_callouts(content)
         content = convert_mermaid_block(content)
         content = ensure_header_spacing(content)
         content = ensure_list_spacing(content)
+
+        if assets is not None:
+            lines = assets.rewrite_lines(content.split("\n"), Path(source_path).parent, dest_path.parent)
+            content = "\n".join(lines)
+
+        if prerender_dir is not None:
+            from prerender import prerender
+            content = prerender(content, prerender_dir, Path(dest_path).parent)
         
+        metadata = note_metadata(content)
 
         # If destination exists, check if content is identical
         if dest_path.exists():
-            with open(dest_path, 'r', encoding='utf-8') as f:
-                dest_content = f.read()
-            
-            if content == dest_content:
-                # Content is identical; do not touch the file.
-                return
+            if known_hash is not None:
+                if metadata["hash"] == known_hash:
+                    return metadata
+            else:
+                with open(dest_path, 'r', encoding='utf-8') as f:
+                    dest_content = f.read()
+                
+                if content == dest_content:
+                    # Content is identical; do not touch the file.
+                    return metadata
 
-        with open(dest_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        writer.write(dest_path, [content.encode('utf-8')])
+        if own_writer:
+            writer.commit()
         
         print(f"Processed: {Path(source_path).name} -> {Path(dest_path).name}")
+        return metadata
 
     except Exception as e:
         print(f"[ERROR] Failed to process {source_path}: {e}")
+        return None
+
+def vault_files(input_path, pack=None):
+    """
+    (path relative to the input, pack member or None) for every input file.
+    """
+    if pack is not None:
+        for name in pack.names():
+            yield Path(name), pack.member(name)
+        return
+    for root, _, files in os.walk(input_path):
+        for file in files:
+            yield (Path(root) / file).relative_to(input_path), None
+
+def read_index(output_path):
+    index_path = Path(output_path) / INDEX_NAME
+    if not index_path.exists():
+        return {}
+    try:
+        return json.loads(index_path.read_text(encoding='utf-8'))
+    except ValueError:
+        return {}
+
+def write_index(output_path, index, writer):
+    """
+    Writes the metadata index, sorted newest first like the listing page.
+    Left untouched if nothing changed.
+    """
+    index_path = Path(output_path) / INDEX_NAME
+    notes = sorted(index.items(), key=lambda item: (str(item[1].get("date", "")), item[0]), reverse=True)
+    content = json.dumps(dict(notes), indent=2, ensure_ascii=False) + "\n"
+
+    if index_path.exists() and index_path.read_text(encoding='utf-8') == content:
+        return
+    writer.write(index_path, [content.encode('utf-8')])
+    print(f"Updated index: {index_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="Convert GFM notes to Quarto notes.")
-    parser.add_argument("input_dir", help="Source folder")
+    parser.add_argument("input_dir", help="Source folder, or a vault pack (see vault_pack.py)")
     parser.add_argument("output_dir", help="Destination folder")
+    parser.add_argument("--prerender", action="store_true",
+                        help="Render math and mermaid to static SVGs (needs latex/dvisvgm, mmdc)")
+    parser.add_argument("--hash-assets", action="store_true",
+                        help="Store attachments once under content-hashed names in <output>/assets")
+    parser.add_argument("--only", nargs="+", metavar="PATH",
+                        help="Convert or copy just these files (relative to the source folder)")
 
     args = parser.parse_args()
     
@@ -192,31 +646,90 @@ def main():
 
     print(f"Starting conversion: {input_path} -> {output_path}")
 
+    pack = None
+    if input_path.is_file():
+        from vault_pack import VaultPack
+        try:
+            pack = VaultPack(input_path)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        if args.hash_assets:
+            print("Error: --hash-assets needs an input folder, not a pack.")
+            return
+
+    only = {Path(p).as_posix() for p in args.only} if args.only else None
     file_count = 0
+    index = {}
+    # Hashes from the last run stand in for reading every destination back
+    previous_index = read_index(output_path)
+    AtomicWriter.clean(output_path)
+    writer = AtomicWriter()
+    prerender_dir = output_path / "prerendered" if args.prerender else None
+    assets = None
+    if args.hash_assets:
+        from assets import AssetStore
+        assets = AssetStore(output_path / "assets", input_path, writer)
     
-    # Walk through the input directory
-    for root, _, files in os.walk(input_path):
-        for file in files:
-            file_path = Path(root) / file
+    # Walk through the input directory (or pack)
+    for rel_path, member in vault_files(input_path, pack):
+        # e.g. _notes/physics/mech.md -> physics/mech.md
+        file_path = input_path / rel_path
+        if only is not None and rel_path.as_posix() not in only:
+            continue
+
+        # Filter extensions
+        if file_path.suffix.lower() in TARGET_EXTENSIONS:
+            dest_file_path = output_path / rel_path
             
-            # Filter extensions
-            if file_path.suffix.lower() in TARGET_EXTENSIONS:
-                # Calculate relative path to maintain structure
-                # e.g. _notes/physics/mech.md -> physics/mech.md
-                rel_path = file_path.relative_to(input_path)
-                dest_file_path = output_path / rel_path
-                
-                # Turn all files into qmd
-                dest_file_path = dest_file_path.with_suffix('.qmd')
-                
-                process_file(file_path, dest_file_path)
+            # Turn all files into qmd
+            dest_file_path = dest_file_path.with_suffix('.qmd')
+            
+            index_key = dest_file_path.relative_to(output_path).as_posix()
+            known_hash = previous_index.get(index_key, {}).get("hash")
+            metadata = process_file(file_path, dest_file_path, prerender_dir, writer, known_hash, assets, member)
+            if metadata is not None:
+                index[index_key] = metadata
+            file_count += 1
+        elif member is not None and (only is not None or rel_path.parts[0] == "attachments"):
+            # Attachments in a pack go through the writer, and only if they differ
+            dest_file_path = output_path / rel_path
+            if not matches_file([member.data], dest_file_path):
+                writer.write(dest_file_path, [member.data])
+            if only is not None:
                 file_count += 1
 
-    # Copy attachments folder over
-    import shutil
     source_attachments = f"{input_path}/attachments"
     dest_attachments = f"{output_path}/attachments"
-    if os.path.exists(source_attachments):
+    # Files picked with --only that aren't notes are attachments
+    extra_files = [] if only is None else \
+        [p for p in sorted(only) if Path(p).suffix.lower() not in TARGET_EXTENSIONS]
+    if assets is not None:
+        # Attachments no note links to are kept too, just not renamed in any page
+        if only is not None:
+            for rel in extra_files:
+                assets.add(input_path / rel)
+        elif os.path.exists(source_attachments):
+            assets.add_folder(source_attachments)
+        assets.save(partial=only is not None)
+
+    if only is not None:
+        # A partial run keeps the index entries of the notes it didn't touch
+        index = dict(previous_index, **index)
+
+    # Notes land first; the index only records hashes of files now in place
+    writer.commit()
+    write_index(output_path, index, writer)
+    writer.commit()
+
+    # Copy attachments folder over
+    import shutil
+    if assets is None and only is not None and pack is None:
+        for rel in extra_files:
+            os.makedirs((output_path / rel).parent, exist_ok=True)
+            shutil.copy2(input_path / rel, output_path / rel)
+            file_count += 1
+    elif assets is None and os.path.exists(source_attachments):
         shutil.copytree(source_attachments, 
                         dest_attachments, 
                         dirs_exist_ok=True)
@@ -0,0 +1,327 @@
+import os
+import re
+import ast
+import sys
+import json
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from urllib.parse import unquote
+
+from assets import MD_LINK, HTML_LINK, EXTERNAL, NOTE_EXTENSIONS, file_hash
+
+# Build graph of the site: which inputs produce which docs/ outputs.
+#
+#   python scripts/buildgraph.py --dry-run           # what would be rebuilt, and why
+#   python scripts/buildgraph.py                     # rebuild only that, in order
+#   python scripts/buildgraph.py --export graph.json # graph for another executor
+#   python scripts/buildgraph.py --record            # accept the current tree as built
+#
+# Nodes are files named by their path from the repository root, with content
+# hashes. Actions turn input nodes into output nodes: converting a note,
+# copying an attachment, running a figure script, rendering a page. An action
+# is stale when the hashes of its inputs or outputs differ from the ones
+# recorded after it last ran, or when an action it depends on is stale.
+# Everything is sorted and hashed by content only, so the same tree always
+# gives the same graph.
+
+ROOT = Path(__file__).resolve().parent.parent
+STATE_FILE = ROOT / ".buildgraph-state.json"
+NOTES_SOURCE = "_notes"
+NOTES_OUTPUT = "notes"
+OUTPUT_DIR = "docs"
+SITE_INDEXES = ["docs/search.json", "docs/listings.json"]
+NOTES_INDEX = f"{NOTES_OUTPUT}/_index.json"
+
+# Bump when the graph layout changes so every action is rebuilt once
+GRAPH_VERSION = "2"
+
+FIGURE_FORMATS = {'.png', '.svg', '.pdf', '.webp', '.gif', '.jpg', '.jpeg'}
+# Local files pulled in by frontmatter or _quarto.yml (themes, filters, css)
+CONFIG_FILE = re.compile(r"[\w./-]+\.(?:lua|scss|css|js|bib|csl)\b")
+
+def rel(path):
+    return Path(os.path.relpath(path, ROOT)).as_posix()
+
+def frontmatter(text):
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != "---":
+        return ""
+    end = next((i for i in range(1, len(lines)) if lines[i].strip() == "---"), len(lines))
+    return "\n".join(lines[1:end])
+
+def linked_files(path, text):
+    """
+    Local files a page links to or names in its frontmatter, as paths from the root.
+    """
+    found = set()
+    targets = [m.group(2) for m in MD_LINK.finditer(text)]
+    targets += [m.group(2) for m in HTML_LINK.finditer(text)]
+    targets += CONFIG_FILE.findall(frontmatter(text))
+    for target in targets:
+        if EXTERNAL.match(target):
+            continue
+        candidate = (path.parent / unquote(target.split("#")[0])).resolve()
+        if candidate.is_file() and ROOT in candidate.parents:
+            found.add(rel(candidate))
+    return found
+
+def script_outputs(path):
+    """
+    Inputs and outputs of a figure script, read from its source: image file
+    names in string literals are outputs, imports of sibling modules are inputs.
+    Scripts run from their own folder.
+    """
+    tree = ast.parse(path.read_text(encoding='utf-8'))
+    outputs, inputs = set(), {rel(path)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) \
+                and Path(node.value).suffix.lower() in FIGURE_FORMATS and "\n" not in node.value:
+            outputs.add(rel(path.parent / node.value))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [a.name for a in node.names] if isinstance(node, ast.Import) else [node.module or ""]
+            for name in names:
+                sibling = path.parent / (name.split(".")[0] + ".py")
+                if sibling.exists():
+                    inputs.add(rel(sibling))
+    return inputs, outputs
+
+class Graph:
+    """
+    Nodes, plus actions keyed by id, each with a command, a working folder,
+    and the nodes it reads and writes.
+    """
+    def __init__(self):
+        self.actions = {}
+        self._hashes = {}
+
+    def add(self, action_id, cmd, inputs, outputs, cwd="."):
+        self.actions[action_id] = {
+            "cmd": cmd,
+            "cwd": cwd,
+            "inputs": sorted(set(inputs)),
+            "outputs": sorted(set(outputs)),
+        }
+
+    def hash(self, node):
+        if node not in self._hashes:
+            path = ROOT / node
+            self._hashes[node] = file_hash(path) if path.is_file() else None
+        return self._hashes[node]
+
+    def forget(self, nodes):
+        for node in nodes:
+            self._hashes.pop(node, None)
+
+    def producers(self):
+        return {out: action_id for action_id, action in self.actions.items() for out in action["outputs"]}
+
+    def order(self):
+        """
+        Action ids in dependency order, ties broken by id.
+        """
+        producers = self.producers()
+        deps = {a: {producers[i] for i in act["inputs"] if i in producers} - {a}
+                for a, act in self.actions.items()}
+        done, ordered = set(), []
+        while len(ordered) < len(deps):
+            ready = sorted(a for a in deps if a not in done and deps[a] <= done)
+            if not ready:
+                raise ValueError(f"Dependency cycle among: {sorted(set(deps) - done)}")
+            ordered.extend(ready)
+            done.update(ready)
+        return ordered
+
+    def signature(self, action_id):
+        action = self.actions[action_id]
+        record = [GRAPH_VERSION, action["cmd"], action["cwd"],
+                  [[n, self.hash(n)] for n in action["inputs"]]]
+        return hashlib.sha256(json.dumps(record).encode('utf-8')).hexdigest()
+
+    def outputs_state(self, action_id):
+        return {n: self.hash(n) for n in self.actions[action_id]["outputs"]}
+
+    def stale(self, state):
+        """
+        Returns {action id: reason} for every action that needs to run.
+        """
+        producers = self.producers()
+        reasons = {}
+        for action_id in self.order():
+            action = self.actions[action_id]
+            previous = state.get(action_id)
+            upstream = sorted({producers[i] for i in action["inputs"] if producers.get(i) in reasons})
+            if previous is None:
+                reasons[action_id] = "never built"
+            elif upstream:
+                reasons[action_id] = f"after {upstream[0]}" + (f" (+{len(upstream) - 1})" if len(upstream) > 1 else "")
+            elif previous["signature"] != self.signature(action_id):
+                changed = [n for n in action["inputs"] if previous.get("inputs", {}).get(n) != self.hash(n)]
+                reasons[action_id] = f"changed {changed[0]}" if changed else "command changed"
+            elif previous["outputs"] != self.outputs_state(action_id):
+                missing = [n for n in action["outputs"] if self.hash(n) is None]
+                reasons[action_id] = f"missing {missing[0]}" if missing else "output modified"
+        return reasons
+
+    def record(self, action_id, state):
+        action = self.actions[action_id]
+        state[action_id] = {
+            "signature": self.signature(action_id),
+            "inputs": {n: self.hash(n) for n in action["inputs"]},
+            "outputs": self.outputs_state(action_id),
+        }
+
+    def export(self):
+        nodes = sorted({n for a in self.actions.values() for n in a["inputs"] + a["outputs"]})
+        return {
+            "version": GRAPH_VERSION,
+            "nodes": {n: {"hash": self.hash(n)} for n in nodes},
+            "actions": {a: dict(self.actions[a], signature=self.signature(a)) for a in self.order()},
+        }
+
+def build_graph():
+    graph = Graph()
+    python = "python3"
+    converter = "scripts/batch_gfm_to_quarto.py"
+    config = (ROOT / "_quarto.yml").read_text(encoding='utf-8')
+    site_inputs = ["_quarto.yml"] + sorted(f for f in set(CONFIG_FILE.findall(config)) if (ROOT / f).is_file())
+
+    # Notes: _notes/x.md -> notes/x.qmd, attachments copied alongside
+    source_root = ROOT / NOTES_SOURCE
+    pages = []
+    for path in sorted(source_root.rglob("*")):
+        if not path.is_file():
+            continue
+        rel_path = path.relative_to(source_root).as_posix()
+        if path.suffix.lower() in {'.md', '.qmd', '.rmd', '.markdown'}:
+            out = f"{NOTES_OUTPUT}/{Path(rel_path).with_suffix('.qmd').as_posix()}"
+            graph.add(f"convert:{rel_path}",
+                      [python, converter, NOTES_SOURCE, NOTES_OUTPUT, "--only", rel_path],
+                      [rel(path), converter], [out])
+            # Conversion keeps links, so the source tells what the page will use
+            links = linked_files(path, path.read_text(encoding='utf-8'))
+            resources = {f"{NOTES_OUTPUT}/{Path(l).relative_to(NOTES_SOURCE).as_posix()}"
+                         for l in links if l.startswith(NOTES_SOURCE + "/")
+                         and Path(l).suffix.lower() not in NOTE_EXTENSIONS}
+            pages.append((out, resources))
+        elif not path.name.startswith("."):
+            graph.add(f"copy:{rel_path}",
+                      [python, converter, NOTES_SOURCE, NOTES_OUTPUT, "--only", rel_path],
+                      [rel(path), converter], [f"{NOTES_OUTPUT}/{rel_path}"])
+
+    # Figure scripts in the slide folders write images next to the decks
+    for script in sorted((ROOT / "slides").glob("*/*.py")):
+        inputs, outputs = script_outputs(script)
+        if outputs:
+            graph.add(f"figure:{rel(script)}", [python, script.name], inputs, outputs, cwd=rel(script.parent))
+
+    # Every --only conversion merges its note into the notes index, so like
+    # the site index below this action has no command of its own.
+    graph.add("notes-index", None, [out for out, _ in pages], [NOTES_INDEX])
+
+    # Other pages: the home page and the slide decks (not `_` expansions)
+    listings = set()
+    for page in [ROOT / "index.qmd"] + sorted((ROOT / "slides").glob("*/*.qmd")):
+        if not page.name.startswith("_"):
+            text = page.read_text(encoding='utf-8')
+            pages.append((rel(page), linked_files(page, text)))
+            front = frontmatter(text)
+            if re.search(r"^listing:", front, re.MULTILINE) and "contents:" not in front:
+                listings.add(rel(page))
+
+    # Rendering copies each linked resource to the same place under docs/
+    html = []
+    for page, resources in pages:
+        out = f"{OUTPUT_DIR}/{Path(page).with_suffix('.html').as_posix()}"
+        html.append(out)
+        copied = [f"{OUTPUT_DIR}/{r}" for r in resources if Path(r).suffix.lower() not in NOTE_EXTENSIONS
+                  and not r.endswith((".lua", ".scss"))]
+        inputs = [page] + site_inputs + sorted(resources)
+        if page in listings:
+            # A listing without `contents` lists every page in and below its folder
+            folder = Path(page).parent
+            inputs += [p for p, _ in pages if p != page and folder in Path(p).parents]
+        graph.add(f"render:{page}", ["quarto", "render", page], inputs, [out] + copied)
+
+    # Quarto refreshes the search index and listings with every page it
+    # renders, so this action has no command of its own.
+    graph.add("site-index", None, html, SITE_INDEXES)
+    return graph
+
+def load_state():
+    if not STATE_FILE.exists():
+        return {}
+    try:
+        return json.loads(STATE_FILE.read_text(encoding='utf-8'))
+    except ValueError:
+        return {}
+
+def save_state(state):
+    STATE_FILE.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n", encoding='utf-8')
+
+def build_env():
+    """
+    Environment for reproducible actions: fixed hash seed, timezone and
+    SOURCE_DATE_EPOCH (the last commit), which matplotlib and quarto honour
+    for embedded dates.
+    """
+    env = dict(os.environ, PYTHONHASHSEED="0", TZ="UTC", MPLBACKEND="Agg")
+    if "SOURCE_DATE_EPOCH" not in env:
+        result = subprocess.run(["git", "log", "-1", "--format=%ct"], cwd=ROOT,
+                                capture_output=True, text=True)
+        env["SOURCE_DATE_EPOCH"] = result.stdout.strip() or "0"
+    return env
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild what changed, using the site's build graph.")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Only print what would be rebuilt")
+    parser.add_argument("--export", metavar="FILE", help="Write the graph as JSON ('-' for stdout)")
+    parser.add_argument("--record", action="store_true", help="Record the current tree as built, running nothing")
+
+    args = parser.parse_args()
+
+    graph = build_graph()
+    state = load_state()
+
+    if args.export:
+        text = json.dumps(graph.export(), indent=2, sort_keys=True) + "\n"
+        if args.export == "-":
+            sys.stdout.write(text)
+        else:
+            Path(args.export).write_text(text, encoding='utf-8')
+            print(f"Wrote graph: {len(graph.actions)} actions -> {args.export}")
+        return
+
+    if args.record:
+        for action_id in graph.order():
+            graph.record(action_id, state)
+        save_state(state)
+        print(f"Recorded {len(graph.actions)} actions as built.")
+        return
+
+    stale = graph.stale(state)
+    for action_id in graph.order():
+        if action_id in stale:
+            print(f"{action_id:<60} {stale[action_id]}")
+    print(f"--- {len(stale)} of {len(graph.actions)} actions to rebuild. ---")
+    if args.dry_run or not stale:
+        return
+
+    env = build_env()
+    for action_id in graph.order():
+        if action_id not in stale:
+            continue
+        action = graph.actions[action_id]
+        if action["cmd"] is not None:
+            print(f"Running: {' '.join(action['cmd'])}")
+            subprocess.run(action["cmd"], cwd=ROOT / action["cwd"], env=env, check=True)
+        graph.forget(action["outputs"])
+        graph.record(action_id, state)
+        # Saved after every action, so a failure keeps the progress made
+        save_state(state)
+
+    print(f"--- Completed. Rebuilt {len(stale)} actions. ---")
+
+if __name__ == "__main__":
+    main()
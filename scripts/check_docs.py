@@ -0,0 +1,236 @@
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+# Post-render check of the built site in docs/.
+#
+#   python scripts/check_docs.py                 # check docs/
+#   python scripts/check_docs.py -j 8 --orphans  # also list every unreferenced asset
+#
+# Every HTML page and stylesheet is parsed in a worker pool, and each local
+# href/src (plus the hrefs in search.json and listings.json) is resolved
+# against the output tree, including #fragments on pages. Reported: broken
+# links, assets nothing references, and pages whose own weight (HTML plus the
+# local files it loads) is over budget. Parsed pages are cached by size and
+# mtime next to the checked folder (.check-docs-cache.json beside docs/), so a
+# re-check only parses what the last render changed.
+
+ROOT = Path(__file__).resolve().parent.parent
+CACHE_NAME = ".check-docs-cache.json"
+SITE_INDEXES = ["search.json", "listings.json"]
+DEFAULT_MAX_PAGE_KB = 2048
+
+# Bump when the parser changes so cached pages are parsed again
+PARSER_VERSION = "1"
+
+LINK_ATTRS = {"href", "src", "data-src", "poster", "data-background-image", "data-background-video"}
+CSS_URL = re.compile(r"""url\(\s*["']?([^"')]+)["']?\s*\)|@import\s+["']([^"']+)["']""")
+EXTERNAL = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|//)", re.IGNORECASE)
+READ_BYTES = 64 * 1024
+
+class PageParser(HTMLParser):
+    """
+    Collects link targets and element ids while a page is fed to it in chunks.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.ids = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if value is None:
+                continue
+            if name in LINK_ATTRS:
+                self.links.append(value)
+            elif name == "srcset":
+                self.links.extend(part.split()[0] for part in value.split(",") if part.strip())
+            elif name == "id" or (name == "name" and tag == "a"):
+                self.ids.append(value)
+            elif name == "style" and "url(" in value:
+                self.links.extend(a or b for a, b in CSS_URL.findall(value))
+
+def parse_file(path):
+    """
+    Worker: returns (links, ids) of an HTML page or stylesheet.
+    """
+    if path.endswith(".css"):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return [a or b for a, b in CSS_URL.findall(f.read())], []
+
+    parser = PageParser()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for chunk in iter(lambda: f.read(READ_BYTES), ""):
+            parser.feed(chunk)
+    parser.close()
+    return parser.links, parser.ids
+
+def index_links(docs):
+    """
+    Links listed in Quarto's search index and listings, keyed by index file.
+    search.json hrefs are relative to the site root, listings use absolute paths.
+    """
+    found = {}
+    for name in SITE_INDEXES:
+        path = docs / name
+        if not path.exists():
+            continue
+        data = json.loads(path.read_text(encoding='utf-8'))
+        if name == "search.json":
+            found[name] = [entry["href"] for entry in data if entry.get("href")]
+        else:
+            found[name] = [item for listing in data for item in listing.get("items", [])]
+    return found
+
+def resolve(docs, page, link):
+    """
+    Maps a link on `page` to (file path from docs, fragment), or None for
+    links that leave the site.
+    """
+    if EXTERNAL.match(link) or link.startswith(("mailto:", "javascript:")):
+        return None
+    parts = urlsplit(link)
+    if not parts.path:
+        return page, unquote(parts.fragment)
+    if parts.path.startswith("/"):
+        target = docs / unquote(parts.path.lstrip("/"))
+    else:
+        target = (docs / page).parent / unquote(parts.path)
+    target = Path(os.path.normpath(target))
+    if target.is_dir() or parts.path.endswith("/"):
+        target = target / "index.html"
+    return Path(os.path.relpath(target, docs)).as_posix(), unquote(parts.fragment)
+
+def cache_file(docs):
+    return docs.resolve().parent / CACHE_NAME
+
+def load_cache(docs):
+    """
+    The cached pages of `docs`, or {} if the cache is missing, stale or was
+    written for another folder.
+    """
+    path = cache_file(docs)
+    if not path.exists():
+        return {}
+    try:
+        cache = json.loads(path.read_text(encoding='utf-8'))
+    except ValueError:
+        return {}
+    if cache.get("version") != PARSER_VERSION or cache.get("docs") != str(docs.resolve()):
+        return {}
+    return cache
+
+def scan(docs, jobs):
+    """
+    Parses every page and stylesheet under `docs`, reusing cached results for
+    unchanged files. Returns ({path: (links, ids)}, {path: size}, parsed count).
+    """
+    cache = load_cache(docs)
+    pages = cache.get("pages", {})
+    sizes = {}
+    todo = []
+    for root, _, files in os.walk(docs):
+        for file in files:
+            path = Path(root) / file
+            rel_path = path.relative_to(docs).as_posix()
+            stat = path.stat()
+            sizes[rel_path] = stat.st_size
+            if path.suffix not in (".html", ".css"):
+                continue
+            entry = pages.get(rel_path)
+            if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                todo.append((rel_path, stat))
+
+    if todo:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(parse_file, [str(docs / p) for p, _ in todo], chunksize=8)
+            for (rel_path, stat), (links, ids) in zip(todo, results):
+                pages[rel_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "links": links, "ids": ids}
+
+    # Drop files that are gone so the cache doesn't grow forever
+    pages = {p: e for p, e in pages.items() if p in sizes}
+    cache = {"version": PARSER_VERSION, "docs": str(docs.resolve()), "pages": pages}
+    cache_file(docs).write_text(json.dumps(cache) + "\n", encoding='utf-8')
+    return {p: (e["links"], e["ids"]) for p, e in pages.items()}, sizes, len(todo)
+
+def check(docs, jobs, max_page_kb):
+    parsed, sizes, fresh = scan(docs, jobs)
+    ids = {p: set(page_ids) for p, (_, page_ids) in parsed.items()}
+
+    sources = {p: links for p, (links, _) in parsed.items()}
+    sources.update(index_links(docs))
+
+    broken = []
+    referenced = set()
+    loads = {}
+    for page in sorted(sources):
+        for link in dict.fromkeys(sources[page]):
+            target = resolve(docs, page, link)
+            if target is None:
+                continue
+            path, fragment = target
+            if path not in sizes:
+                broken.append((page, link, "missing file"))
+                continue
+            referenced.add(path)
+            if page.endswith(".html") and not path.endswith(".html"):
+                loads.setdefault(page, set()).add(path)
+            # Reveal routes (#/slide) and empty anchors aren't element ids
+            if fragment and not fragment.startswith("/") and path.endswith(".html") \
+                    and fragment not in ids.get(path, ()):
+                broken.append((page, link, "missing anchor"))
+
+    unreferenced = sorted(p for p in sizes if p not in referenced and not p.endswith(".html")
+                          and p not in SITE_INDEXES and not p.startswith("."))
+
+    oversized = []
+    for page in sorted(p for p in sizes if p.endswith(".html")):
+        weight = sizes[page] + sum(sizes[p] for p in loads.get(page, ()))
+        if weight > max_page_kb * 1024:
+            oversized.append((page, weight))
+
+    return broken, unreferenced, oversized, len(parsed), fresh
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the rendered site for broken links and unused assets.")
+    parser.add_argument("docs", nargs="?", default=str(ROOT / "docs"), help="Rendered site folder")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--max-page-kb", type=float, default=DEFAULT_MAX_PAGE_KB,
+                        help="Flag pages whose HTML plus local assets exceed this")
+    parser.add_argument("--orphans", action="store_true", help="List every unreferenced asset")
+
+    args = parser.parse_args()
+
+    docs = Path(args.docs)
+    if not docs.is_dir():
+        print(f"Error: '{docs}' does not exist.")
+        sys.exit(1)
+
+    broken, unreferenced, oversized, parsed, fresh = check(docs, args.jobs, args.max_page_kb)
+
+    for page, link, reason in broken:
+        print(f"[broken] {page}: {link} ({reason})")
+    for page, weight in oversized:
+        print(f"[large]  {page}: {weight / 1024:.0f} KiB")
+
+    # Libraries ship files that are only loaded from scripts; summarize those
+    libs = [p for p in unreferenced if p.startswith("site_libs/")]
+    for path in unreferenced if args.orphans else [p for p in unreferenced if p not in libs]:
+        print(f"[unused] {path}")
+    if libs and not args.orphans:
+        print(f"[unused] {len(libs)} files in site_libs/ (list them with --orphans)")
+
+    print(f"--- Checked {parsed} files ({fresh} parsed, {parsed - fresh} cached): "
+          f"{len(broken)} broken links, {len(unreferenced)} unused assets, {len(oversized)} large pages. ---")
+    if broken:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Optional build stage: renders LaTeX math and mermaid diagrams to static SVG
+# at conversion time, so pages need neither MathJax nor mermaid.js.
+#
+# Every SVG is named after the hash of its source, which makes the asset
+# folder its own cache: an expression or diagram is only rendered once, no
+# matter how many notes or runs use it. Math needs `latex` and `dvisvgm`
+# (TeX Live), mermaid needs `mmdc` (mermaid-cli). Anything that can't be
+# rendered is left as-is for the browser to typeset.
+
+# Bump to invalidate every cached SVG when the rendering setup changes
+RENDER_VERSION = "1"
+
+LATEX_PREAMBLE = r"""\documentclass{article}
+\usepackage{amsmath,amssymb,amsfonts,braket}
+\usepackage[active,tightpage]{preview}
+\pagestyle{empty}
+\begin{document}
+"""
+
+CODE_FENCE = re.compile(r"^\s*(```|~~~)")
+MERMAID_FENCE = re.compile(r"^\s*```\{?mermaid\}?\s*$")
+INLINE_CODE = re.compile(r"(`+).*?\1")
+DISPLAY_MATH = re.compile(r"\$\$(.+?)\$\$", re.DOTALL)
+# Pandoc's rule: no space after the opening $, none before the closing $,
+# and the closing $ is not followed by a digit.
+INLINE_MATH = re.compile(r"(?<![\\$])\$(?![\s$])((?:\\\$|[^$\n])+?)(?<!\s)\$(?!\d)")
+
+def source_hash(kind, source):
+    return hashlib.sha256(f"{RENDER_VERSION}:{kind}:{source}".encode("utf-8")).hexdigest()[:20]
+
+def have_tools(*tools):
+    return all(shutil.which(t) for t in tools)
+
+def split_code(text):
+    """
+    Splits text into (is_code, chunk) pieces along fenced code blocks and
+    inline code spans, so math inside code is never touched.
+    """
+    pieces = []
+    buf = []
+    in_code = False
+    for line in text.splitlines(keepends=True):
+        if CODE_FENCE.match(line):
+            if not in_code and buf:
+                pieces.append((False, "".join(buf)))
+                buf = []
+            buf.append(line)
+            if in_code:
+                pieces.append((True, "".join(buf)))
+                buf = []
+            in_code = not in_code
+            continue
+        buf.append(line)
+    if buf:
+        pieces.append((in_code, "".join(buf)))
+
+    # Inline code spans inside prose
+    out = []
+    for is_code, chunk in pieces:
+        if is_code:
+            out.append((True, chunk))
+            continue
+        last = 0
+        for m in INLINE_CODE.finditer(chunk):
+            out.append((False, chunk[last:m.start()]))
+            out.append((True, m.group(0)))
+            last = m.end()
+        out.append((False, chunk[last:]))
+    return out
+
+def render_math_batch(expressions, asset_dir):
+    """
+    Renders {hash: (latex, display)} to asset_dir/<hash>.svg with one latex
+    run and one dvisvgm run. Returns the hashes that rendered.
+    """
+    if not expressions or not have_tools("latex", "dvisvgm"):
+        return set()
+
+    names = list(expressions)
+    with tempfile.TemporaryDirectory() as tmp:
+        body = []
+        for name in names:
+            tex, display = expressions[name]
+            body.append(r"\begin{preview}$" + (r"\displaystyle " if display else "") + tex + r"$\end{preview}")
+        tex_path = Path(tmp) / "math.tex"
+        tex_path.write_text(LATEX_PREAMBLE + "\n\n".join(body) + "\n\\end{document}\n", encoding="utf-8")
+
+        # nonstopmode keeps going past a bad expression; its page is still
+        # produced, so page numbers stay aligned with `names`.
+        subprocess.run(["latex", "-interaction=nonstopmode", "math.tex"], cwd=tmp,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        dvi = Path(tmp) / "math.dvi"
+        if not dvi.exists():
+            return set()
+        subprocess.run(["dvisvgm", "--no-fonts", "--exact-bbox", "--page=1-", "--output=page%p", "math.dvi"],
+                       cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        log = (Path(tmp) / "math.log").read_text(encoding="utf-8", errors="replace")
+        if "\n! " in log:
+            # Some expression failed, and we can't tell which page is mis-typeset.
+            # Render one at a time so only the bad ones fall back to the browser.
+            if len(names) == 1:
+                return set()
+            rendered = set()
+            for name in names:
+                rendered |= render_math_batch({name: expressions[name]}, asset_dir)
+            return rendered
+
+        width = len(str(len(names)))
+        rendered = set()
+        for page, name in enumerate(names, start=1):
+            for candidate in (f"page{page:0{width}d}.svg", f"page{page}.svg"):
+                svg = Path(tmp) / candidate
+                if svg.exists():
+                    shutil.move(str(svg), asset_dir / f"{name}.svg")
+                    rendered.add(name)
+                    break
+        return rendered
+
+def render_mermaid(source, out_path):
+    if not have_tools("mmdc"):
+        return False
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "diagram.mmd"
+        src.write_text(source, encoding="utf-8")
+        result = subprocess.run(["mmdc", "-i", str(src), "-o", str(out_path), "-b", "transparent"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0 and out_path.exists()
+
+def math_tag(src, tex, display):
+    # Raw inline HTML either way, so math inside lists and callouts keeps
+    # its place in the block structure. styles.css centers display math.
+    alt = " ".join(tex.split()).replace("&", "&amp;").replace('"', "&quot;").replace("<", "&lt;").replace(">", "&gt;").replace("`", "&#96;")
+    cls = "math display" if display else "math inline"
+    return f'`<img class="{cls}" src="{src}" alt="{alt}">`{{=html}}'
+
+def prerender_mermaid(text, asset_dir, rel_prefix):
+    """
+    Replaces mermaid fences with an image of the rendered diagram.
+    """
+    lines = text.splitlines()
+    out = []
+    i = 0
+    while i < len(lines):
+        if not MERMAID_FENCE.match(lines[i]):
+            out.append(lines[i])
+            i += 1
+            continue
+        end = i + 1
+        while end < len(lines) and not CODE_FENCE.match(lines[end]):
+            end += 1
+        source = "\n".join(lines[i + 1:end])
+        name = source_hash("mermaid", source)
+        svg = asset_dir / f"{name}.svg"
+        if svg.exists() or render_mermaid(source, svg):
+            out.append(f"![]({rel_prefix}/{name}.svg){{.mermaid-static}}")
+        else:
+            out.extend(lines[i:end + 1])
+        i = end + 1
+    return "\n".join(out)
+
+def prerender_math(text, asset_dir, rel_prefix):
+    """
+    Replaces $...$ and $$...$$ outside code with images of the typeset math.
+    """
+    pieces = split_code(text)
+
+    # Collect every expression first so all uncached ones share a latex run
+    found = {}
+    for is_code, chunk in pieces:
+        if is_code:
+            continue
+        for m in DISPLAY_MATH.finditer(chunk):
+            found[source_hash("display", m.group(1))] = (m.group(1), True)
+        for m in INLINE_MATH.finditer(DISPLAY_MATH.sub("", chunk)):
+            found[source_hash("inline", m.group(1))] = (m.group(1), False)
+
+    missing = {k: v for k, v in found.items() if not (asset_dir / f"{k}.svg").exists()}
+    render_math_batch(missing, asset_dir)
+
+    def replace(m, display):
+        name = source_hash("display" if display else "inline", m.group(1))
+        if not (asset_dir / f"{name}.svg").exists():
+            return m.group(0)
+        return math_tag(f"{rel_prefix}/{name}.svg", m.group(1), display)
+
+    out = []
+    for is_code, chunk in pieces:
+        if is_code:
+            out.append(chunk)
+            continue
+        # Display math first, then inline math in the text between displays
+        last = 0
+        for m in DISPLAY_MATH.finditer(chunk):
+            out.append(INLINE_MATH.sub(lambda im: replace(im, False), chunk[last:m.start()]))
+            out.append(replace(m, True))
+            last = m.end()
+        out.append(INLINE_MATH.sub(lambda im: replace(im, False), chunk[last:]))
+    return "".join(out)
+
+def prerender(text, asset_dir, note_dir):
+    """
+    Runs both prerender passes on a converted note. SVGs go to asset_dir and
+    are linked relative to the folder the note is written to.
+    """
+    asset_dir = Path(asset_dir)
+    asset_dir.mkdir(parents=True, exist_ok=True)
+    rel_prefix = Path(os.path.relpath(asset_dir, note_dir)).as_posix()
+    text = prerender_mermaid(text, asset_dir, rel_prefix)
+    return prerender_math(text, asset_dir, rel_prefix)
@@ -0,0 +1,374 @@
+import io
+import os
+import sys
+import json
+import time
+import html
+import base64
+import hashlib
+import argparse
+import threading
+import contextlib
+import subprocess
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+
+from assets import IMMUTABLE_CACHE_CONTROL
+from batch_gfm_to_quarto import TARGET_EXTENSIONS, process_file
+
+# Live preview of the notes without `make generate` and a full quarto render.
+#
+#   python scripts/preview.py                  # http://localhost:4200/
+#   python scripts/preview.py --port 8000 --input _notes
+#
+# Notes are converted with process_file() into memory, never to disk. A page
+# is rendered with pandoc (quarto's bundled one if available) the first time
+# it's requested and kept in memory. A watcher polls the vault, reconverts a
+# note when it changes, re-renders just that page and tells browsers showing
+# it to reload over a websocket. Everything else (site_libs, styles, the
+# slides) is served from the last full render in docs/, with the hashed
+# attachments of a --hash-assets render marked immutable.
+
+ROOT = Path(__file__).resolve().parent.parent
+NOTES_URL = "notes"
+ASSETS_URL = f"{NOTES_URL}/assets"
+RELOAD_PATH = "/_livereload"
+POLL_SECONDS = 0.1
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+RELOAD_SCRIPT = """<script>
+(function () {
+  var ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "%s");
+  ws.onmessage = function (e) {
+    if (JSON.parse(e.data).path === decodeURIComponent(location.pathname)) location.reload();
+  };
+})();
+</script>
+""" % RELOAD_PATH
+
+PAGE_HEAD = """<link rel="stylesheet" href="/site_libs/bootstrap/bootstrap.min.css">
+<link rel="stylesheet" href="/styles.css">
+<style>
+body { max-width: 52rem; margin: 2rem auto; padding: 0 1rem; }
+div[class*="callout-"] { border-left: 4px solid #0d6efd; padding: .5rem 1rem; margin: 1rem 0; background: #f5f8ff; }
+div.callout-warning, div.callout-caution { border-color: #fd7e14; background: #fff8f0; }
+div.callout-tip { border-color: #198754; background: #f3faf6; }
+</style>
+"""
+
+class MemoryWriter:
+    """
+    Stand-in for AtomicWriter that keeps written files in a dict.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def write(self, path, blocks):
+        self.files[Path(path)] = b"".join(blocks)
+
+    def commit(self):
+        pass
+
+def pandoc_command():
+    for cmd in (["quarto", "pandoc"], ["pandoc"]):
+        try:
+            subprocess.run(cmd + ["--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            return cmd
+        except (OSError, subprocess.CalledProcessError):
+            continue
+    return None
+
+class Vault:
+    """
+    The converted notes, keyed by their URL path (`notes/<name>.html`), each
+    with its source, converted text, metadata and rendered page.
+    """
+    def __init__(self, input_path):
+        self.input_path = Path(input_path)
+        self.output_path = ROOT / NOTES_URL
+        self.writer = MemoryWriter()
+        self.pandoc = pandoc_command()
+        self.notes = {}
+        self.lock = threading.Lock()
+
+    def url(self, source):
+        rel_path = Path(source).relative_to(self.input_path).with_suffix(".html")
+        return f"{NOTES_URL}/{rel_path.as_posix()}"
+
+    def sources(self):
+        """
+        {source path: mtime_ns} for every note in the vault.
+        """
+        found = {}
+        stack = [self.input_path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in TARGET_EXTENSIONS:
+                        try:
+                            found[Path(entry.path)] = entry.stat().st_mtime_ns
+                        except FileNotFoundError:
+                            # Renamed away mid-scan (editors save by rename)
+                            continue
+        return found
+
+    def convert(self, source):
+        """
+        Runs process_file() into memory. Returns True if the converted text changed.
+        """
+        url = self.url(source)
+        dest = (self.output_path / Path(source).relative_to(self.input_path)).with_suffix(".qmd")
+        note = self.notes.get(url)
+        # A hash that never matches forces the first conversion into memory
+        # instead of comparing against whatever is on disk.
+        known_hash = note["metadata"]["hash"] if note else ""
+        # process_file() reports every conversion; only pass its errors on
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            metadata = process_file(source, dest, writer=self.writer, known_hash=known_hash)
+        for line in log.getvalue().splitlines():
+            if line.startswith("[ERROR]"):
+                print(line)
+        if metadata is None or (note and metadata["hash"] == note["metadata"]["hash"]):
+            return False
+        with self.lock:
+            self.notes[url] = {
+                "source": source,
+                "text": self.writer.files.pop(dest).decode('utf-8'),
+                "metadata": metadata,
+                "html": None,
+            }
+        return True
+
+    def remove(self, source):
+        with self.lock:
+            self.notes.pop(self.url(source), None)
+
+    def render(self, url):
+        """
+        The page for `url`, rendering it first if it isn't cached. None if no such note.
+        """
+        with self.lock:
+            note = self.notes.get(url)
+        if note is None:
+            return None
+        if note["html"] is None:
+            note["html"] = self.render_text(note["text"], note["metadata"].get("title") or Path(url).stem)
+        return note["html"]
+
+    def render_text(self, text, title):
+        if self.pandoc is None:
+            body = f"<p><em>pandoc not found, showing the converted source.</em></p><pre>{html.escape(text)}</pre>"
+            return f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>" \
+                   f"{PAGE_HEAD}</head><body>{body}{RELOAD_SCRIPT}</body></html>"
+        result = subprocess.run(
+            self.pandoc + ["-f", "markdown", "-t", "html5", "--standalone", "--mathjax",
+                           "--metadata", f"pagetitle={title}"],
+            input=text, capture_output=True, text=True, encoding='utf-8',
+        )
+        if result.returncode != 0:
+            return f"<!DOCTYPE html><html><body><pre>{html.escape(result.stderr)}</pre>{RELOAD_SCRIPT}</body></html>"
+        return result.stdout.replace("</head>", PAGE_HEAD + "</head>", 1) \
+                            .replace("</body>", RELOAD_SCRIPT + "</body>", 1)
+
+    def listing(self):
+        with self.lock:
+            notes = sorted(self.notes.items(), key=lambda item: str(item[1]["metadata"].get("date", "")), reverse=True)
+        rows = "".join(
+            f'<li><a href="/{quote(url)}">{html.escape(str(note["metadata"].get("title") or Path(url).stem))}</a>'
+            f' <small>{html.escape(str(note["metadata"].get("date", "")))}</small></li>'
+            for url, note in notes
+        )
+        return f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Notes preview</title>{PAGE_HEAD}" \
+               f"</head><body><h1>Notes</h1><ul>{rows}</ul>{RELOAD_SCRIPT}</body></html>"
+
+class Clients:
+    """
+    Open live-reload websockets.
+    """
+    def __init__(self):
+        self.sockets = set()
+        self.lock = threading.Lock()
+
+    def add(self, wfile):
+        with self.lock:
+            self.sockets.add(wfile)
+
+    def discard(self, wfile):
+        with self.lock:
+            self.sockets.discard(wfile)
+
+    def send(self, message):
+        payload = json.dumps(message).encode('utf-8')
+        if len(payload) < 126:
+            frame = bytes([0x81, len(payload)]) + payload
+        elif len(payload) < 1 << 16:
+            frame = bytes([0x81, 126]) + len(payload).to_bytes(2, "big") + payload
+        else:
+            frame = bytes([0x81, 127]) + len(payload).to_bytes(8, "big") + payload
+        with self.lock:
+            for wfile in list(self.sockets):
+                try:
+                    wfile.write(frame)
+                    wfile.flush()
+                except OSError:
+                    self.sockets.discard(wfile)
+
+def poll(vault, clients, known):
+    """
+    Pushes a reload for each note whose converted text changed since `known`.
+    """
+    current = vault.sources()
+    for source, mtime in current.items():
+        if known.get(source) == mtime:
+            continue
+        start = time.perf_counter()
+        if vault.convert(source):
+            url = vault.url(source)
+            vault.render(url)
+            clients.send({"path": f"/{url}"})
+            clients.send({"path": "/"})
+            print(f"Reloaded: /{url} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    for source in set(known) - set(current):
+        vault.remove(source)
+        clients.send({"path": f"/{vault.url(source)}"})
+    known.clear()
+    known.update(current)
+
+def watch(vault, clients, known):
+    """
+    Polls the vault until the server stops. A failed poll is reported and
+    retried on the next one, since `known` is only updated once a poll succeeds.
+    """
+    while True:
+        time.sleep(POLL_SECONDS)
+        try:
+            poll(vault, clients, known)
+        except Exception as e:
+            print(f"[ERROR] Watching {vault.input_path} failed: {type(e).__name__}: {e}")
+
+def make_handler(vault, clients, docs):
+    from http.server import SimpleHTTPRequestHandler
+
+    class PreviewHandler(SimpleHTTPRequestHandler):
+        # Browsers only upgrade to a websocket over HTTP/1.1
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(docs), **kwargs)
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_page(self, page):
+            body = page.encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = unquote(urlsplit(self.path).path).lstrip("/")
+            if "/" + path == RELOAD_PATH:
+                return self.live_reload()
+            if path in ("", "index.html"):
+                return self.send_page(vault.listing())
+            page = vault.render(path)
+            if page is not None:
+                return self.send_page(page)
+            # Hashed names never change content, so browsers can keep them
+            if path.startswith(ASSETS_URL + "/"):
+                asset = (docs / path).resolve()
+                if asset.is_file() and docs.resolve() in asset.parents:
+                    return self.send_file(asset, IMMUTABLE_CACHE_CONTROL)
+            # Attachments straight from the vault, the rest from the last render
+            if path.startswith(NOTES_URL + "/"):
+                source = (vault.input_path / path[len(NOTES_URL) + 1:]).resolve()
+                if source.is_file() and vault.input_path.resolve() in source.parents:
+                    return self.send_file(source)
+            return super().do_GET()
+
+        def send_file(self, path, cache_control=None):
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", self.guess_type(str(path)))
+            self.send_header("Content-Length", str(len(data)))
+            if cache_control:
+                self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def live_reload(self):
+            key = self.headers.get("Sec-WebSocket-Key")
+            if not key:
+                self.send_error(400)
+                return
+            accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            clients.add(self.wfile)
+            try:
+                # Nothing is read from the browser; wait for it to close
+                while True:
+                    header = self.rfile.read(2)
+                    if len(header) < 2 or header[0] & 0x0f == 0x8:
+                        break
+                    length = header[1] & 0x7f
+                    if length == 126:
+                        length = int.from_bytes(self.rfile.read(2), "big")
+                    elif length == 127:
+                        length = int.from_bytes(self.rfile.read(8), "big")
+                    self.rfile.read(length + (4 if header[1] & 0x80 else 0))
+            except OSError:
+                pass
+            finally:
+                clients.discard(self.wfile)
+                self.close_connection = True
+
+    return PreviewHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a live-reloading preview of the notes.")
+    parser.add_argument("--input", default=str(ROOT / "_notes"), help="Notes vault")
+    parser.add_argument("--docs", default=str(ROOT / "docs"), help="Rendered site for everything but the notes")
+    parser.add_argument("--port", type=int, default=4200, help="Port to listen on")
+
+    args = parser.parse_args()
+
+    vault = Vault(args.input)
+    if not vault.input_path.exists():
+        print(f"Error: Input directory '{vault.input_path}' does not exist.")
+        sys.exit(1)
+    if vault.pandoc is None:
+        print("Warning: pandoc not found (install quarto); pages show the converted source.")
+
+    start = time.perf_counter()
+    known = vault.sources()
+    for source in sorted(known):
+        vault.convert(source)
+    print(f"Converted {len(vault.notes)} notes in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    from http.server import ThreadingHTTPServer
+
+    clients = Clients()
+    threading.Thread(target=watch, args=(vault, clients, known), daemon=True).start()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(vault, clients, Path(args.docs)))
+    server.daemon_threads = True
+    print(f"Serving http://127.0.0.1:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+# Entry points checked by `make startup`, relative to the repository root.
+# Each one should answer --help without importing numpy/pandas/matplotlib.
+ENTRY_POINTS = [
+    ["scripts/batch_gfm_to_quarto.py", "--help"],
+    ["scripts/gfm_to_quarto.py", "--help"],
+    ["scripts/assets.py", "--help"],
+    ["scripts/buildgraph.py", "--help"],
+    ["scripts/check_docs.py", "--help"],
+    ["scripts/preview.py", "--help"],
+    ["scripts/vault_pack.py", "--help"],
+    ["slides/scripts/cells.py", "--help"],
+    ["slides/patentingBad/dashboard.py", "--help"],
+    ["slides/transistorCapacitances/sweep.py", "--help"],
+    ["slides/scripts/prefragment.py", "--help"],
+]
+
+# Allowed startup time on top of a bare `python -c pass`
+DEFAULT_BUDGET_MS = 50
+
+def wall_ms(cmd, repeat):
+    """
+    Best-of-`repeat` wall time of a command in milliseconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def slowest_imports(cmd, count, skip=()):
+    """
+    Runs `cmd` under -X importtime and returns the `count` slowest top-level
+    imports as (cumulative ms, module), leaving out modules in `skip`.
+    """
+    result = subprocess.run(
+        [cmd[0], "-X", "importtime"] + cmd[1:],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level imports are the ones not indented under another import
+        if name.startswith("  ") or name.strip() in skip:
+            continue
+        imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure startup time of the repository entry points.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Fail if an entry point exceeds the interpreter baseline by this much")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per entry point (best is kept)")
+    parser.add_argument("--imports", type=int, default=0, metavar="N",
+                        help="Also show the N slowest imports of each entry point")
+
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    baseline = wall_ms([sys.executable, "-c", "pass"], args.repeat)
+    print(f"Interpreter baseline: {baseline:.1f} ms")
+    # Whatever the bare interpreter imports (site, encodings, ...) is not ours
+    skip = {name for _, name in slowest_imports([sys.executable, "-c", "pass"], None)}
+
+    failed = 0
+    for entry in ENTRY_POINTS:
+        cmd = [sys.executable, os.path.join(root, entry[0])] + entry[1:]
+        overhead = wall_ms(cmd, args.repeat) - baseline
+        status = "ok" if overhead <= args.budget_ms else "SLOW"
+        if status == "SLOW":
+            failed += 1
+        print(f"[{status:>4}] {overhead:7.1f} ms  {' '.join(entry)}")
+        for ms, name in slowest_imports(cmd, args.imports, skip):
+            print(f"         {ms:7.1f} ms  import {name}")
+
+    if failed:
+        print(f"Error: {failed} entry point(s) over the {args.budget_ms:.0f} ms budget.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
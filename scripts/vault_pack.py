@@ -0,0 +1,296 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path, PurePosixPath, PureWindowsPath
+
+from assets import file_blocks, file_hash
+
+# Packed vault: a whole notes folder in one file, for moving the vault around
+# without per-file overhead. batch_gfm_to_quarto.py takes a pack in place of
+# the input folder and reads notes straight out of its memory map.
+#
+#   python scripts/vault_pack.py pack _notes vault.pack                      # create, or update in place
+#   python scripts/vault_pack.py pack _notes delta.pack --base vault.pack    # just the blobs vault.pack lacks
+#   python scripts/vault_pack.py apply vault.pack delta.pack                 # bring vault.pack up to date
+#   python scripts/vault_pack.py unpack vault.pack _notes
+#   python scripts/vault_pack.py list vault.pack
+#
+# Layout: a fixed header (magic, index offset, index length), then the blobs,
+# then a JSON index mapping each path to the offset, length and sha256 of its
+# blob. Identical files share one blob. Updates append new blobs and a new
+# index after the old end and only then rewrite the header, so an interrupted
+# update leaves the previous pack readable. Space held by blobs no longer
+# indexed is reclaimed by rewriting the pack once it outweighs the live data.
+# A delta pack indexes every path but holds only the blobs its base lacks;
+# those entries have a null offset. Paths are relative and POSIX-style; a
+# pack naming anything outside its root is refused when opened.
+
+MAGIC = b"VAULTPK1"
+HEADER = struct.Struct("<8sQQ")
+VERSION = 1
+
+def safe_name(name):
+    """
+    True if `name` stays inside the folder it is unpacked or converted into.
+    """
+    path = PurePosixPath(name)
+    return bool(name) and not path.is_absolute() and ".." not in path.parts \
+        and "\\" not in name and not PureWindowsPath(name).drive
+
+class Member:
+    """
+    One file in a pack. `data` is a zero-copy view into the pack's memory map.
+    """
+    def __init__(self, pack, name, entry):
+        self.pack = pack
+        self.name = name
+        self.entry = entry
+        self.length = entry["length"]
+
+    @property
+    def data(self):
+        offset = self.entry["offset"]
+        if offset is None:
+            raise ValueError(f"{self.name} is only in the base pack of {self.pack.path}")
+        return memoryview(self.pack.mm)[offset:offset + self.length]
+
+    def region(self):
+        """
+        (memory map, start, end) of the member's bytes.
+        """
+        offset = self.entry["offset"]
+        if offset is None:
+            raise ValueError(f"{self.name} is only in the base pack of {self.pack.path}")
+        return self.pack.mm, offset, offset + self.length
+
+    def text(self):
+        # Newlines translated like open(path, 'r') would
+        return str(self.data, 'utf-8').replace("\r\n", "\n").replace("\r", "\n")
+
+class VaultPack:
+    """
+    Read access to a pack file through a read-only memory map.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise ValueError(f"{path} is not a vault pack")
+        magic, offset, length = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a vault pack")
+        raw = self.mm[offset:offset + length]
+        self.index_hash = hashlib.sha256(raw).hexdigest()
+        self.index = json.loads(raw)
+        self.entries = self.index["entries"]
+        for name in self.entries:
+            if not safe_name(name):
+                raise ValueError(f"{path} has an unsafe member name: {name!r}")
+
+    def names(self):
+        return sorted(self.entries)
+
+    def member(self, name):
+        return Member(self, name, self.entries[name])
+
+def scan(folder, previous=None):
+    """
+    Index entries for every file under `folder` (dotfiles skipped), plus the
+    path holding each blob. Hashes are reused from `previous` entries whose
+    size and mtime match.
+    """
+    previous = previous or {}
+    entries, blobs = {}, {}
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for file in sorted(files):
+            if file.startswith("."):
+                continue
+            path = Path(root) / file
+            name = path.relative_to(folder).as_posix()
+            stat = path.stat()
+            old = previous.get(name)
+            if old and old["length"] == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns:
+                digest = old["hash"]
+            else:
+                digest = file_hash(path)
+            entries[name] = {"hash": digest, "length": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            blobs.setdefault(digest, path)
+    return entries, blobs
+
+def append_blobs(f, end, entries, located, blobs):
+    """
+    Writes each blob of `entries` not in `located` (hash -> offset) from
+    `blobs` (hash -> path or bytes) starting at `end`, and sets every
+    entry's offset. Returns the new end.
+    """
+    f.seek(end)
+    for name in sorted(entries):
+        entry = entries[name]
+        if entry["hash"] not in located:
+            located[entry["hash"]] = f.tell()
+            source = blobs[entry["hash"]]
+            for block in file_blocks(source) if isinstance(source, Path) else [source]:
+                f.write(block)
+        entry["offset"] = located[entry["hash"]]
+    return f.tell()
+
+def finish(f, index_offset, index):
+    """
+    Writes the index at `index_offset`, then points the header at it. Each
+    step is synced, so the header never refers to a half-written index.
+    """
+    raw = json.dumps(index, sort_keys=True, separators=(",", ":")).encode('utf-8')
+    f.seek(index_offset)
+    f.write(raw)
+    f.truncate()
+    f.flush()
+    os.fsync(f.fileno())
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, index_offset, len(raw)))
+    f.flush()
+    os.fsync(f.fileno())
+
+def write_fresh(out_path, entries, blobs, located=None, base=None):
+    """
+    Writes a new pack next to `out_path` and moves it into place.
+    """
+    out_path = Path(out_path)
+    fd, tmp = tempfile.mkstemp(dir=out_path.parent, prefix=f".{out_path.name}.", suffix=".tmp")
+    try:
+        mode = os.stat(out_path).st_mode & 0o777 if out_path.exists() else None
+        if mode is None:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+        with os.fdopen(fd, 'w+b') as f:
+            end = append_blobs(f, HEADER.size, entries, dict(located or {}), blobs)
+            index = {"version": VERSION, "entries": entries}
+            if base is not None:
+                index["base"] = base
+            finish(f, end, index)
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def update(out_path, entries, blobs, existing):
+    """
+    Brings the pack at `out_path` (open as `existing`) up to `entries`,
+    appending only blobs it doesn't hold. Returns the number appended.
+    """
+    located = {e["hash"]: e["offset"] for e in existing.entries.values() if e["offset"] is not None}
+    lengths = {e["hash"]: e["length"] for e in entries.values()}
+    new = set(lengths) - set(located)
+    if not new and entries == {n: {k: v for k, v in e.items() if k != "offset"} for n, e in existing.entries.items()}:
+        return 0
+    live = sum(lengths.values())
+    dead = len(existing.mm) - HEADER.size - (live - sum(lengths[h] for h in new))
+
+    if dead > max(live, 1 << 20):
+        # Mostly unreachable blobs and old indexes: rewrite instead of growing
+        for name, entry in existing.entries.items():
+            if entry["offset"] is not None:
+                blobs.setdefault(entry["hash"], existing.member(name).data)
+        write_fresh(out_path, entries, blobs)
+        return len(new)
+
+    with open(out_path, 'r+b') as f:
+        end = append_blobs(f, len(existing.mm), entries, located, blobs)
+        finish(f, end, {"version": VERSION, "entries": entries})
+    return len(new)
+
+def pack(source, out_path, base_path=None):
+    out_path = Path(out_path)
+    if base_path is not None:
+        base = VaultPack(base_path)
+        entries, blobs = scan(source, base.entries)
+        have = {e["hash"]: None for e in base.entries.values()}
+        write_fresh(out_path, entries, blobs, located=have, base=base.index_hash)
+        sent = len({e["hash"] for e in entries.values()} - set(have))
+        print(f"Packed: {len(entries)} files, {sent} new blobs -> {out_path} (delta on {Path(base_path).name})")
+        return
+
+    if out_path.exists():
+        existing = VaultPack(out_path)
+        entries, blobs = scan(source, existing.entries)
+        added = update(out_path, entries, blobs, existing)
+        print(f"Updated: {len(entries)} files, {added} new blobs -> {out_path}")
+        return
+
+    entries, blobs = scan(source)
+    write_fresh(out_path, entries, blobs)
+    print(f"Packed: {len(entries)} files, {len(blobs)} blobs -> {out_path}")
+
+def apply(base_path, delta_path):
+    base = VaultPack(base_path)
+    delta = VaultPack(delta_path)
+    if delta.index.get("base") != base.index_hash:
+        print(f"Error: {delta_path} was not made against the current {base_path}.")
+        sys.exit(1)
+
+    entries = {name: {k: v for k, v in e.items() if k != "offset"} for name, e in delta.entries.items()}
+    blobs = {e["hash"]: delta.member(name).data for name, e in delta.entries.items() if e["offset"] is not None}
+    held = {e["hash"] for e in base.entries.values()}
+    missing = [n for n, e in entries.items() if e["hash"] not in held and e["hash"] not in blobs]
+    if missing:
+        print(f"Error: {delta_path} lacks the blob of {missing[0]}.")
+        sys.exit(1)
+
+    added = update(base_path, entries, blobs, base)
+    print(f"Applied: {len(entries)} files, {added} new blobs -> {base_path}")
+
+def unpack(pack_path, dest):
+    vault = VaultPack(pack_path)
+    for name in vault.names():
+        target = Path(dest) / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(vault.member(name).data)
+    print(f"Unpacked: {len(vault.entries)} files -> {dest}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a notes vault into one file, or update and unpack one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("pack", help="Pack a folder (updates the pack in place if it exists)")
+    p.add_argument("source", help="Vault folder")
+    p.add_argument("pack", help="Pack file to write")
+    p.add_argument("--base", help="Write a delta holding only blobs this pack lacks")
+
+    p = commands.add_parser("apply", help="Apply a delta pack to its base")
+    p.add_argument("base", help="Pack to update")
+    p.add_argument("delta", help="Delta made with pack --base")
+
+    p = commands.add_parser("unpack", help="Extract a pack into a folder")
+    p.add_argument("pack", help="Pack file")
+    p.add_argument("dest", help="Destination folder")
+
+    p = commands.add_parser("list", help="List the files in a pack")
+    p.add_argument("pack", help="Pack file")
+
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        pack(args.source, args.pack, args.base)
+    elif args.command == "apply":
+        apply(args.base, args.delta)
+    elif args.command == "unpack":
+        unpack(args.pack, args.dest)
+    else:
+        vault = VaultPack(args.pack)
+        for name in vault.names():
+            entry = vault.entries[name]
+            where = "base" if entry["offset"] is None else entry["offset"]
+            print(f"{entry['length']:>10}  {entry['hash'][:12]}  {where!s:>10}  {name}")
+
+if __name__ == "__main__":
+    main()
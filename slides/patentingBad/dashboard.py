@@ -0,0 +1,176 @@
+#%%
+
+# Config-driven dashboard: renders one facet figure per chart in the config.
+#
+#   python dashboard.py dashboard.json -o dashboard -j 8
+#
+# The OWID snapshots are loaded, merged and normalized once in the parent
+# process. The merged frame is packed into a shared memory block, and each
+# worker in the pool rebuilds a zero-copy view of it instead of re-reading
+# and re-concatenating the data per figure.
+import os
+import json
+import argparse
+
+# numpy, pandas, matplotlib, graphs and the process pool are imported inside
+# the functions that need them, so `--help` and config errors return without
+# loading them.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+# Columns of the merged frame and the dtype each is stored as in shared memory.
+# country and indicator are stored as their categorical codes.
+SHARED_COLUMNS = [
+    ("country", "int16"),
+    ("indicator", "int16"),
+    ("year", "int16"),
+    ("value", "float32"),
+]
+
+# Set in each worker by attach_shared()
+shared_df = None
+_shm = None
+
+def load_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.setdefault("indicators", {})
+    config.setdefault("charts", [])
+    return config
+
+def share_frame(df):
+    from multiprocessing import shared_memory
+    import numpy as np
+    import pandas as pd
+
+    # Copy the merged frame into one shared memory block, column after column.
+    n = len(df)
+    size = sum(np.dtype(dtype).itemsize * n for _, dtype in SHARED_COLUMNS)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    offset = 0
+    for col, dtype in SHARED_COLUMNS:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col].cat.codes
+        else:
+            values = df[col]
+        view = np.ndarray(n, dtype=dtype, buffer=shm.buf, offset=offset)
+        view[:] = values.to_numpy(dtype=dtype)
+        offset += view.nbytes
+    categories = {
+        "country": list(df["country"].cat.categories),
+        "indicator": list(df["indicator"].cat.categories),
+    }
+    return shm, n, categories
+
+def attach_shared(shm_name, n, categories):
+    # Pool initializer: rebuild the merged frame on top of the shared buffer.
+    global shared_df, _shm
+    from multiprocessing import shared_memory
+    import numpy as np
+    import pandas as pd
+
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    columns = {}
+    offset = 0
+    for col, dtype in SHARED_COLUMNS:
+        view = np.ndarray(n, dtype=dtype, buffer=_shm.buf, offset=offset)
+        offset += view.nbytes
+        if col in categories:
+            columns[col] = pd.Categorical.from_codes(view, categories[col])
+        else:
+            columns[col] = view
+    shared_df = pd.DataFrame(columns, copy=False)
+
+def chart_palette(indicators, palette):
+    """
+    Colours for every indicator in a chart. Indicators without one (added
+    through the config) take the unused colours of seaborn's default cycle.
+    """
+    from itertools import cycle
+    import seaborn as sns
+    from matplotlib.colors import to_rgb
+
+    colours = {i: palette[i] for i in indicators if i in palette}
+    taken = {to_rgb(c) for c in colours.values()}
+    spare = cycle([c for c in sns.color_palette() if to_rgb(c) not in taken] or sns.color_palette())
+    for i in indicators:
+        if i not in colours:
+            colours[i] = next(spare)
+    return colours
+
+def render_chart(chart, out_dir, palette):
+    import matplotlib.pyplot as plt
+    import graphs
+
+    countries = chart["countries"]
+    indicators = [graphs.indicator_names.get(i, i) for i in chart["indicators"]]
+
+    df = shared_df[shared_df["country"].isin(countries) & shared_df["indicator"].isin(indicators)]
+    df = df.assign(
+        country=df["country"].cat.set_categories(countries),
+        indicator=df["indicator"].cat.set_categories(indicators),
+    )
+
+    out_path = os.path.join(out_dir, f"{chart['name']}.png")
+    g = graphs.plot_country_facets(
+        df,
+        countries,
+        out_path,
+        palette=chart_palette(indicators, palette),
+        col_wrap=chart.get("col_wrap"),
+        title=chart.get("title", chart["name"]),
+    )
+    plt.close(g.figure)
+    return out_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an OWID facet-figure dashboard.")
+    parser.add_argument("config", help="Dashboard config (JSON)")
+    parser.add_argument("-o", "--output-dir", default="dashboard", help="Destination folder")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+
+    import graphs
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    sources = dict(graphs.owid_urls)
+    sources.update({k: graphs.resolve_url(v) for k, v in config["indicators"].items()})
+    palette = dict(graphs.palette, **config.get("palette", {}))
+    graphs.owid_value_columns.update(config.get("value_columns", {}))
+
+    used = {i for chart in config["charts"] for i in chart["indicators"]}
+    country_names = list(dict.fromkeys(c for chart in config["charts"] for c in chart["countries"]))
+
+    for name in used:
+        graphs.download_csv(sources[name], name)
+
+    combined = graphs.build_combined(
+        sorted(used),
+        country_names,
+        mode=config.get("normalize", graphs.normalize_mode),
+        start_year=config.get("start_year", graphs.start_year),
+        end_year=config.get("end_year", graphs.end_year),
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    shm, n, categories = share_frame(combined)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=attach_shared,
+            initargs=(shm.name, n, categories),
+        ) as pool:
+            futures = [pool.submit(render_chart, chart, args.output_dir, palette)
+                       for chart in config["charts"]]
+            for future in as_completed(futures):
+                future.result()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    print(f"--- Completed. Rendered {len(config['charts'])} charts. ---")
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,14 @@
 
 # Save as innovation_dashboard.py or run in a Jupyter/Colab cell
 import io
-import requests
+import os
+import json
+import hashlib
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 
-sns.set(style="whitegrid", context="talk")
-plt.rcParams["figure.dpi"] = 150
+# requests, seaborn and matplotlib are imported where they are used, so
+# snapshot-only runs and importers like dashboard.py don't pay for them.
 
 # ----- CONFIG -----
 countries = {
@@ -30,6 +30,23 @@ owid_urls = {
     "rd_gdp": "https://ourworldindata.org/grapher/research-spending-gdp.csv"
 }
 
+# Local dataset cache. Each endpoint is kept as a Parquet snapshot plus a small
+# JSON sidecar holding the ETag and content hashes used for revalidation.
+#   OWID_SNAPSHOT=1     read pinned snapshots from disk only (no network)
+#   OWID_BASE_URL=...   fetch from a stand-in server instead of ourworldindata.org,
+#                       e.g. `python -m http.server` over a folder of grapher CSVs
+cache_dir = os.environ.get("OWID_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "owid_cache"))
+snapshot_only = os.environ.get("OWID_SNAPSHOT", "0") not in ("", "0")
+base_url = os.environ.get("OWID_BASE_URL")
+
+def resolve_url(url):
+    if base_url:
+        return base_url.rstrip("/") + "/" + url.rsplit("/", 1)[-1]
+    return url
+
+owid_urls = {k: resolve_url(v) for k, v in owid_urls.items()}
+
 # Policy years - fill in (these are placeholders / examples).
 # Replace or extend with the exact policy years you want to mark.
 policy_years = {
@@ -43,144 +60,251 @@ policy_years = {
 
 # --------------------
 
-def download_csv(url):
-    print(f"Downloading {url} ...")
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return pd.read_csv(io.StringIO(r.text))
-
-# Fetch data
-patent_df = download_csv(owid_urls["patents"])
-pub_df = download_csv(owid_urls["publications"])
-rd_df = download_csv(owid_urls["rd_gdp"])
-
-# Select countries and filter years
-def filter_owid(df, countries_iso, value_col=None):
-    # OWID format: "country","year","<indicator code>"
-    # The CSV often contains one value column with the indicator name as header.
-    # We'll identify the numeric column (not country/year)
-    numeric_cols = [c for c in df.columns if c not in ["country", "Year", "year", "Country"]]
-    data_col = numeric_cols[-1]  # usually last
-    df_sel = df[df['Entity'].isin(countries_iso)] if 'Entity' in df.columns else df[df['country'].isin(countries_iso)]
-    # normalize column names
-    if 'Year' in df_sel.columns:
-        df_sel = df_sel.rename(columns={'Year':'year'})
-    if 'Entity' in df_sel.columns:
-        df_sel = df_sel.rename(columns={'Entity':'country'})
-    df_sel = df_sel[['country','year',data_col]].rename(columns={data_col:'value'})
-    df_sel['year'] = df_sel['year'].astype(int)
-    df_sel = df_sel[(df_sel['year'] >= start_year) & (df_sel['year'] <= end_year)]
-    return df_sel
-
-# OWID CSVs sometimes use 'Entity', sometimes 'country'
-def prepare_owid_dataset(df, name):
-    # handle both possible column names
-    if 'Entity' in df.columns:
-        df = df.rename(columns={'Entity':'country'})
-    if 'Year' in df.columns:
-        df = df.rename(columns={'Year':'year'})
-    # the value column is the one that's not 'country' or 'year'
-    value_cols = [c for c in df.columns if c not in ('country','year')]
-    if len(value_cols) != 1:
-        # keep last column as value
-        value_col = value_cols[-1]
-    else:
-        value_col = value_cols[0]
-    df = df[['country','year',value_col]].rename(columns={value_col:'value'})
-    df['year'] = df['year'].astype(int)
-    df = df[(df['year'] >= start_year) & (df['year'] <= end_year)]
-    return df
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
-patent_prepared = prepare_owid_dataset(patent_df, 'patents')
-pub_prepared = prepare_owid_dataset(pub_df, 'publications')
-rd_prepared = prepare_owid_dataset(rd_df, 'rd_gdp')
+def snapshot_path(name):
+    return os.path.join(cache_dir, f"{name}.parquet")
 
-# The OWID "country" names may differ from our display names; build mapping
-iso_to_name = {v: k for k, v in countries.items()}
-# OWID uses full country names (e.g., "United States", "Korea, Rep.") - let's map by ISO where possible:
-# We'll normalize by matching ISO codes via a small lookup (requests to restcountries could be added),
-# but simplest: filter by display names in our countries dict:
-target_country_names = list(countries.keys())
+def load_snapshot_meta(name):
+    # Returns the snapshot metadata, or {} if the snapshot is missing or its
+    # file no longer matches the recorded hash.
+    snap_path = snapshot_path(name)
+    meta_path = os.path.join(cache_dir, f"{name}.json")
+    if not (os.path.exists(snap_path) and os.path.exists(meta_path)):
+        return {}
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if sha256_file(snap_path) != meta.get("snapshot_sha256"):
+        print(f"Snapshot {snap_path} failed hash check, ignoring it.")
+        return {}
+    return meta
+
+def save_snapshot_meta(name, meta):
+    with open(os.path.join(cache_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+def save_snapshot(name, df, meta):
+    os.makedirs(cache_dir, exist_ok=True)
+    snap_path = snapshot_path(name)
+    df.to_parquet(snap_path, index=False)
+    meta["snapshot_sha256"] = sha256_file(snap_path)
+    save_snapshot_meta(name, meta)
 
-def keep_targets(df):
-    # reduce to our list of display country names (best-effort)
-    df = df[df['country'].isin(target_country_names)]
+# OWID grapher CSVs are "Entity","Code","Year","<indicator>" (older exports use
+# "country"/"year"). Only the entity, year and value columns are ever used.
+ENTITY_COLS = ("Entity", "country", "Country")
+YEAR_COLS = ("Year", "year")
+csv_chunksize = 100_000
+
+# Value column to use per source, for CSVs with more than one data column.
+# Sources not listed here must have exactly one.
+owid_value_columns = {}
+
+def read_owid_csv(buf, source="CSV", value_col=None, chunksize=csv_chunksize):
+    # Parse the header once to find the columns, then scan the body in chunks
+    # reading only those three columns with compact dtypes.
+    header = list(pd.read_csv(buf, nrows=0).columns)
+    buf.seek(0)
+
+    def pick(candidates, what):
+        found = [c for c in header if c in candidates]
+        if not found:
+            raise ValueError(f"{source}: no {what} column (expected one of {', '.join(candidates)}; got {header})")
+        return found[0]
+
+    entity_col = pick(ENTITY_COLS, "entity")
+    year_col = pick(YEAR_COLS, "year")
+    if value_col is None:
+        rest = [c for c in header if c not in ENTITY_COLS + YEAR_COLS + ("Code",)]
+        if len(rest) != 1:
+            raise ValueError(f"{source}: expected one value column, found {rest}; "
+                             f"set its column in owid_value_columns")
+        value_col = rest[0]
+    elif value_col not in header:
+        raise ValueError(f"{source}: value column '{value_col}' not in {header}")
+
+    chunks = pd.read_csv(
+        buf,
+        usecols=[entity_col, year_col, value_col],
+        dtype={entity_col: str, year_col: "int16", value_col: "float32"},
+        chunksize=chunksize,
+    )
+    df = pd.concat(chunks, ignore_index=True)
+    df = df.rename(columns={entity_col: 'country', year_col: 'year', value_col: 'value'})
+    df['country'] = df['country'].astype('category')
     return df
 
-pat = keep_targets(patent_prepared)
-pub = keep_targets(pub_prepared)
-rd = keep_targets(rd_prepared)
+def download_csv(url, name):
+    # Makes sure an up-to-date snapshot of `url` exists on disk.
+    meta = load_snapshot_meta(name)
 
-# Merge into a tidy DataFrame
-pat['indicator'] = 'patent_applications'
-pub['indicator'] = 'publications'
-rd['indicator'] = 'rd_gdp_pct'
+    if snapshot_only:
+        if not meta:
+            raise FileNotFoundError(f"No pinned snapshot for '{name}' in {cache_dir}")
+        return
+
+    # Revalidate against the server; a 304 means the snapshot is still current.
+    headers = {}
+    if meta.get("url") == url and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+
+    import requests
+
+    print(f"Downloading {url} ...")
+    r = requests.get(url, headers=headers, timeout=30)
+    if r.status_code == 304:
+        print(f"  not modified, using {name} snapshot")
+        return
+    r.raise_for_status()
 
-combined = pd.concat([pat, pub, rd], ignore_index=True)
+    fetched = {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "body_sha256": hashlib.sha256(r.content).hexdigest(),
+        "fetched": datetime.now().isoformat(timespec="seconds"),
+    }
 
-# pivot for plotting convenience
-# we'll keep as long format for seaborn but ensure numeric values
-combined['value'] = pd.to_numeric(combined['value'], errors='coerce')
+    # Servers without ETags still get a cheap check: identical bodies reuse the
+    # snapshot. The new ETag and URL are still recorded, so the next run can
+    # revalidate instead of downloading again.
+    if meta.get("body_sha256") == fetched["body_sha256"]:
+        meta.update(fetched)
+        save_snapshot_meta(name, meta)
+        return
 
-# If any country missing data for some indicator, NaNs will occur; that's ok.
-# Prepare country-order for facet grid
-country_order = list(countries.keys())
+    save_snapshot(name, read_owid_csv(io.BytesIO(r.content), url, owid_value_columns.get(name)), fetched)
+
+# OWID uses full country names, so we filter by the display names in `countries`.
+target_country_names = list(countries.keys())
+
+def load_owid_dataset(name, country_names=target_country_names,
+                      start_year=start_year, end_year=end_year):
+    # Country and year filters are pushed down into the Parquet scan, so only
+    # the matching row groups are decoded.
+    df = pd.read_parquet(
+        snapshot_path(name),
+        columns=['country', 'year', 'value'],
+        filters=[
+            ('country', 'in', list(country_names)),
+            ('year', '>=', start_year),
+            ('year', '<=', end_year),
+        ],
+    )
+    df['country'] = df['country'].astype(pd.CategoricalDtype(list(country_names)))
+    return df
+
+# Display names and colours for each OWID source
+indicator_names = {
+    "patents": "patent_applications",
+    "publications": "publications",
+    "rd_gdp": "rd_gdp_pct",
+}
+palette = {'patent_applications':'tab:green','publications':'tab:blue','rd_gdp_pct':'tab:red'}
 
 # Normalize values per country and indicator
-def normalize_per_country_indicator(df):
+#   "max"    divide by the series maximum (series with max <= 0 are left as-is)
+#   "zscore" subtract the series mean and divide by its standard deviation
+#   "index"  divide by the series value at base_year (base_year = 1.0)
+normalize_mode = "max"
+base_year = 2000
+
+def normalize_per_country_indicator(df, mode=normalize_mode, base_year=base_year):
     df = df.copy()
-    for country in df['country'].unique():
-        for indicator in df['indicator'].unique():
-            mask = (df['country'] == country) & (df['indicator'] == indicator)
-            max_val = df.loc[mask, 'value'].max()
-            if max_val > 0:
-                df.loc[mask, 'value'] = df.loc[mask, 'value'] / max_val
+    groups = df.groupby(['country', 'indicator'], observed=True, sort=False)['value']
+    if mode == "max":
+        max_val = groups.transform('max')
+        df['value'] = (df['value'] / max_val).where(max_val > 0, df['value'])
+    elif mode == "zscore":
+        std = groups.transform('std')
+        df['value'] = (df['value'] - groups.transform('mean')) / std.where(std > 0)
+    elif mode == "index":
+        base = df['value'].where(df['year'] == base_year)
+        base = base.groupby([df['country'], df['indicator']], observed=True, sort=False).transform('first')
+        df['value'] = df['value'] / base.where(base != 0)
+    else:
+        raise ValueError(f"Unknown normalize mode: {mode}")
     return df
 
-combined = normalize_per_country_indicator(combined)
-
-# Plotting
-g = sns.FacetGrid(
-    combined, 
-    col='country', 
-    hue='indicator', 
-    sharey=False,              
-    # aspect=3, 
-    height=5,
-    # dpi=300, 
-    row_order=country_order,              
-    palette={'patent_applications':'tab:green','publications':'tab:blue','rd_gdp_pct':'tab:red'}
-)
-
-# def plot_line(data, color, label, indicator, **kwargs):
-#     sns.lineplot(data=data, x='year', y='value', hue='indicator', legend=False, **kwargs)
-
-g.map_dataframe(
-    sns.lineplot, 
-    x = 'year', 
-    y = 'value'
-)
-g.add_legend(
-    title='Indicator'
-)
-
-# Add vertical lines for policy years
-for ax, country in zip(g.axes.flatten(), country_order):
-    years = policy_years.get(country, [])
-    ylim = ax.get_ylim()
-    for y in years:
-        ax.axvline(x=y, color='gray', linestyle='--', linewidth=1.2)
-        ax.text(y + 0.2, ylim[1]*0.9, 'Policy: {}'.format(y), rotation=90, va='top', fontsize=8, color='gray')
-
-# Beautify labels
-for ax in g.axes.flatten():
-    ax.set_xlabel('Year')
-    ax.set_ylabel('')
-
-g.set_titles(row_template='{row_name}')
-plt.subplots_adjust(hspace=0.6)
-plt.suptitle('Patents, Publications, and R&D (% GDP) — 1990–2021', y=1.02, fontsize=16)
-plt.tight_layout()
-plt.savefig('innovation_timeseries_by_country.png', bbox_inches='tight')
-print("Saved figure to innovation_timeseries_by_country.png")
-plt.show()
+def build_combined(sources, country_names=target_country_names, mode=normalize_mode,
+                   start_year=start_year, end_year=end_year):
+    # Merge the snapshots in `sources` into one tidy, normalized frame.
+    # If any country is missing data for some indicator, NaNs will occur; that's ok.
+    frames = []
+    for name in sources:
+        df = load_owid_dataset(name, country_names, start_year, end_year)
+        df['indicator'] = indicator_names.get(name, name)
+        frames.append(df)
+    combined = pd.concat(frames, ignore_index=True)
+    combined['indicator'] = combined['indicator'].astype('category')
+    return normalize_per_country_indicator(combined, mode=mode)
+
+def plot_country_facets(combined, country_order, out_path, palette=palette,
+                        policy_years=policy_years, col_wrap=None,
+                        title='Patents, Publications, and R&D (% GDP) — 1990–2021'):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set(style="whitegrid", context="talk")
+    plt.rcParams["figure.dpi"] = 150
+
+    g = sns.FacetGrid(
+        combined, 
+        col='country', 
+        hue='indicator', 
+        sharey=False,              
+        # aspect=3, 
+        height=5,
+        # dpi=300, 
+        col_order=country_order,              
+        col_wrap=col_wrap,
+        palette=palette
+    )
+
+    # def plot_line(data, color, label, indicator, **kwargs):
+    #     sns.lineplot(data=data, x='year', y='value', hue='indicator', legend=False, **kwargs)
+
+    g.map_dataframe(
+        sns.lineplot, 
+        x = 'year', 
+        y = 'value'
+    )
+    g.add_legend(
+        title='Indicator'
+    )
+
+    # Add vertical lines for policy years
+    for ax, country in zip(g.axes.flatten(), country_order):
+        years = policy_years.get(country, [])
+        ylim = ax.get_ylim()
+        for y in years:
+            ax.axvline(x=y, color='gray', linestyle='--', linewidth=1.2)
+            ax.text(y + 0.2, ylim[1]*0.9, 'Policy: {}'.format(y), rotation=90, va='top', fontsize=8, color='gray')
+
+    # Beautify labels
+    for ax in g.axes.flatten():
+        ax.set_xlabel('Year')
+        ax.set_ylabel('')
+
+    g.set_titles(row_template='{row_name}')
+    g.figure.subplots_adjust(hspace=0.6)
+    g.figure.suptitle(title, y=1.02, fontsize=16)
+    g.figure.tight_layout()
+    g.figure.savefig(out_path, bbox_inches='tight')
+    print(f"Saved figure to {out_path}")
+    return g
+
+if __name__ == "__main__":
+    # Fetch data
+    for name in owid_urls:
+        download_csv(owid_urls[name], name)
+
+    combined = build_combined(owid_urls)
+    plot_country_facets(combined, target_country_names, 'innovation_timeseries_by_country.png')
+
+    import matplotlib.pyplot as plt
+    plt.show()
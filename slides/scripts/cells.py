@@ -0,0 +1,342 @@
+#%%
+
+# Runs a `#%%` figure script cell by cell, memoizing each cell on disk.
+#
+#   python ../scripts/cells.py figs.py            # run, reusing cached cells
+#   python ../scripts/cells.py figs.py --list     # show cells and cache status
+#   python ../scripts/cells.py figs.py --force    # ignore the cache
+#
+# A cell's cache key is the hash of its code and of the sibling modules it
+# imports, plus the keys of the upstream cells that last wrote (or changed in
+# place) each variable it reads. A hit restores the variables the cell wrote
+# and any files it saved (figures, CSVs), so changing a label in one cell only
+# re-executes that cell and the cells that depend on it.
+import os
+import re
+import ast
+import sys
+import pickle
+import hashlib
+import argparse
+import builtins
+import importlib
+from types import ModuleType
+from pathlib import Path
+
+CELL_MARKER = re.compile(r"^#\s*%%")
+CACHE_DIR = ".cellcache"
+
+class Cell:
+    def __init__(self, index, code, lineno):
+        self.index = index
+        self.code = code
+        self.lineno = lineno
+        self.reads, self.binds, self.mutates, self.imports = analyze_names(code)
+        self.writes = self.binds | self.mutates
+        self.defs = top_level_defs(code)
+        self.key = None
+
+def parse_cells(text):
+    """
+    Splits a script into cells on `#%%` lines. Code before the first marker
+    is its own cell.
+    """
+    cells = []
+    current = []
+    start = 1
+    for lineno, line in enumerate(text.splitlines(keepends=True), start=1):
+        if CELL_MARKER.match(line):
+            if "".join(current).strip():
+                cells.append(Cell(len(cells), "".join(current), start))
+            current = []
+            start = lineno + 1
+            continue
+        current.append(line)
+    if "".join(current).strip():
+        cells.append(Cell(len(cells), "".join(current), start))
+    return cells
+
+def base_name(node):
+    # `data` for data, data.x, data[0].y and so on
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+def scope_names(nodes, bound):
+    """
+    Names a function, class body or comprehension loads from the enclosing
+    scope, and the names it declares global. Everything else it binds is local.
+    """
+    loads, stores, declared = set(), set(bound), set()
+    for node in nodes:
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Name):
+                (loads if isinstance(sub.ctx, ast.Load) else stores).add(sub.id)
+            elif isinstance(sub, ast.arg):
+                stores.add(sub.arg)
+            elif isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                stores.add(sub.name)
+            elif isinstance(sub, (ast.Import, ast.ImportFrom)):
+                stores.update((a.asname or a.name).split(".")[0] for a in sub.names)
+            elif isinstance(sub, ast.Global):
+                declared.update(sub.names)
+    return loads - (stores - declared), declared
+
+def statement_names(stmt):
+    """
+    (loads, stores, mutated, imported) of one top-level statement. Mutated
+    names are those whose value a statement may change in place: the base of
+    an attribute or item assignment, or of a method call.
+    """
+    loads, stores, mutated, imported = set(), set(), set(), set()
+
+    def visit(node):
+        if isinstance(node, ast.Name):
+            (loads if isinstance(node.ctx, ast.Load) else stores).add(node.id)
+            return
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = {(a.asname or a.name).split(".")[0] for a in node.names}
+            stores.update(names)
+            imported.update(names)
+            return
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            # Only the name and the defaults are evaluated here; the body
+            # runs later and binds its own locals
+            if not isinstance(node, ast.Lambda):
+                stores.add(node.name)
+                for decorator in node.decorator_list:
+                    visit(decorator)
+            for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+                visit(default)
+            args = node.args
+            params = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+            params += [a.arg for a in (args.vararg, args.kwarg) if a is not None]
+            body = [node.body] if isinstance(node, ast.Lambda) else node.body
+            free, declared = scope_names(body, params)
+            loads.update(free)
+            stores.update(declared)
+            return
+        if isinstance(node, ast.ClassDef):
+            stores.add(node.name)
+            for child in node.decorator_list + node.bases + node.keywords:
+                visit(child)
+            free, declared = scope_names(node.body, ())
+            loads.update(free)
+            stores.update(declared)
+            return
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            free, declared = scope_names([node], ())
+            loads.update(free)
+            stores.update(declared)
+            return
+        if isinstance(node, ast.Global):
+            stores.update(node.names)
+        elif isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(node.ctx, ast.Load):
+            mutated.add(base_name(node))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            mutated.add(base_name(node.func.value))
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    visit(stmt)
+    mutated.discard(None)
+    return loads, stores, mutated, imported
+
+def analyze_names(code):
+    """
+    Returns the global names a cell reads, binds, changes in place and
+    imports. A name only counts as read if a statement loads it before the
+    cell has bound it.
+    """
+    tree = ast.parse(code)
+    reads, binds, mutates, imports = set(), set(), set(), set()
+    for stmt in tree.body:
+        loads, stores, mutated, imported = statement_names(stmt)
+        reads |= loads - binds
+        binds |= stores
+        mutates |= mutated
+        imports |= imported
+    reads -= set(dir(builtins))
+    return reads, binds, mutates - binds, imports
+
+def local_modules(code, root, found=None):
+    """
+    Sibling modules of the script that `code` imports, directly or through
+    each other, found the way buildgraph.py finds script inputs.
+    """
+    found = set() if found is None else found
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [a.name for a in node.names] if isinstance(node, ast.Import) else [node.module or ""]
+            for name in names:
+                sibling = Path(root) / (name.split(".")[0] + ".py")
+                if sibling.exists() and sibling not in found:
+                    found.add(sibling)
+                    local_modules(sibling.read_text(encoding="utf-8"), root, found)
+    return found
+
+def top_level_defs(code):
+    """
+    Source of the functions and classes a cell defines at top level. These
+    cannot be pickled from an exec'd namespace, so they are re-run on a hit.
+    """
+    tree = ast.parse(code)
+    return {
+        node.name: ast.get_source_segment(code, node, padded=True)
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    }
+
+def assign_keys(cells, root):
+    """
+    Chains each cell's key to the keys of the cells that produced its inputs
+    and to the source of the sibling modules it imports. Method calls on an
+    imported module (plt.figure()) don't make a cell its producer.
+    """
+    producers, modules = {}, set()
+    for cell in cells:
+        h = hashlib.sha256(cell.code.encode("utf-8"))
+        for path in sorted(local_modules(cell.code, root)):
+            h.update(path.name.encode("utf-8") + b"=" + hashlib.sha256(path.read_bytes()).digest())
+        for name in sorted(cell.reads):
+            if name in producers:
+                h.update(f"{name}={producers[name]}".encode("utf-8"))
+        cell.key = h.hexdigest()
+        for name in cell.binds:
+            producers[name] = cell.key
+            if name in cell.imports:
+                modules.add(name)
+            else:
+                modules.discard(name)
+        for name in cell.mutates - modules:
+            producers[name] = cell.key
+
+def snapshot_files(root):
+    # mtimes of everything under the script folder, minus the cache itself
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in (CACHE_DIR, "__pycache__")]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            files[os.path.relpath(path, root)] = os.stat(path).st_mtime_ns
+    return files
+
+def pack_outputs(cell, namespace):
+    """
+    Collects what a cell produced. Returns None if a written value cannot be
+    pickled, in which case the cell is always re-executed.
+    """
+    values, modules = {}, {}
+    for name in cell.writes:
+        if name not in namespace:
+            continue
+        value = namespace[name]
+        if isinstance(value, ModuleType):
+            modules[name] = value.__name__
+            continue
+        if name in cell.defs:
+            continue
+        try:
+            values[name] = pickle.dumps(value)
+        except Exception:
+            return None
+
+    # Styles and fonts set through rcParams carry over into later cells
+    rc = None
+    if "matplotlib" in sys.modules:
+        try:
+            rc = pickle.dumps(dict(sys.modules["matplotlib"].rcParams))
+        except Exception:
+            rc = None
+    return {"values": values, "modules": modules, "defs": cell.defs, "rc": rc}
+
+def restore_outputs(entry, namespace, root):
+    for name, module in entry["modules"].items():
+        namespace[name] = importlib.import_module(module)
+    for name, blob in entry["values"].items():
+        namespace[name] = pickle.loads(blob)
+    for source in entry["defs"].values():
+        exec(source, namespace)
+    if entry["rc"] is not None:
+        import matplotlib
+        matplotlib.rcParams.update(pickle.loads(entry["rc"]))
+    for rel_path, data in entry["files"].items():
+        path = os.path.join(root, rel_path)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    continue
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def run_script(script_path, force=False):
+    script_path = Path(script_path).resolve()
+    root = script_path.parent
+    cache_dir = root / CACHE_DIR / script_path.stem
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    cells = parse_cells(script_path.read_text(encoding="utf-8"))
+    assign_keys(cells, root)
+
+    # Scripts use paths relative to their own folder and call plt.show()
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    os.chdir(root)
+    sys.path.insert(0, str(root))
+    namespace = {"__name__": "__main__", "__file__": str(script_path)}
+
+    for cell in cells:
+        entry_path = cache_dir / f"{cell.key}.pkl"
+        if not force and entry_path.exists():
+            with open(entry_path, 'rb') as f:
+                restore_outputs(pickle.load(f), namespace, root)
+            print(f"[cached] cell {cell.index} (line {cell.lineno})")
+            continue
+
+        print(f"[run]    cell {cell.index} (line {cell.lineno})")
+        before = snapshot_files(root)
+        code = compile("\n" * (cell.lineno - 1) + cell.code, str(script_path), "exec")
+        exec(code, namespace)
+        after = snapshot_files(root)
+
+        entry = pack_outputs(cell, namespace)
+        if entry is None:
+            print(f"         cell {cell.index} wrote unpicklable values, not cached")
+            continue
+        entry["files"] = {}
+        for rel_path, mtime in after.items():
+            if before.get(rel_path) != mtime:
+                with open(root / rel_path, 'rb') as f:
+                    entry["files"][rel_path] = f.read()
+        with open(entry_path, 'wb') as f:
+            pickle.dump(entry, f)
+
+def list_cells(script_path):
+    script_path = Path(script_path).resolve()
+    cache_dir = script_path.parent / CACHE_DIR / script_path.stem
+    cells = parse_cells(script_path.read_text(encoding="utf-8"))
+    assign_keys(cells, script_path.parent)
+    for cell in cells:
+        status = "cached" if (cache_dir / f"{cell.key}.pkl").exists() else "stale"
+        print(f"cell {cell.index} (line {cell.lineno}) [{status}] {cell.key[:12]}")
+        print(f"    writes: {', '.join(sorted(cell.writes))}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a #%% script with per-cell memoization.")
+    parser.add_argument("script", help="Script split into #%% cells")
+    parser.add_argument("--force", action="store_true", help="Re-execute every cell")
+    parser.add_argument("--list", action="store_true", help="List cells and cache status")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.script):
+        print(f"Error: Script '{args.script}' does not exist.")
+        return
+
+    if args.list:
+        list_cells(args.script)
+    else:
+        run_script(args.script, force=args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#%%
+
+# Source-level replacement for auto-fragment.lua.
+#
+#   python slides/scripts/prefragment.py                 # expand every deck
+#   python slides/scripts/prefragment.py --render        # expand, then quarto render
+#   python slides/scripts/prefragment.py --bench 3       # time Lua filter vs pre-render
+#   python slides/scripts/prefragment.py --check         # compare with the Lua filter's output
+#
+# Each deck `<deck>/<deck>.qmd` is expanded once into `<deck>/_<deck>.prefragment.qmd`
+# with every child of an `.auto-fragment-children` div wrapped in (or tagged as)
+# a `.fragment` div, and the Lua filter removed from its frontmatter. Quarto
+# skips `_` files in project renders, so the expanded copy is rendered
+# explicitly with `--output <deck>.html`. Expansions are cached by source hash.
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+
+SLIDES_DIR = Path(__file__).resolve().parent.parent
+CACHE_FILE = SLIDES_DIR / ".prefragment-cache.json"
+FILTER_NAME = "auto-fragment.lua"
+AUTO_CLASS = "auto-fragment-children"
+DEFAULT_STYLE = "fade-in-then-semi-out"
+
+# Bump when the transform changes so cached expansions are regenerated
+TRANSFORM_VERSION = "2"
+
+DIV_OPEN = re.compile(r"^\s*(:{3,})\s*(\{.*\}|[^\s{}:]+)\s*$")
+DIV_CLOSE = re.compile(r"^\s*:{3,}\s*$")
+CODE_FENCE = re.compile(r"^\s*(```|~~~)")
+LIST_MARKER = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+")
+ATX_HEADING = re.compile(r"^ {0,3}#{1,6}(\s|$)")
+STYLE_ATTR = re.compile(r"""\s*\bstyle=("[^"]*"|'[^']*'|\S+)""")
+
+def div_classes(attrs):
+    if not attrs.startswith("{"):
+        return [attrs]
+    return re.findall(r"(?<![\w=\"'])\.([\w-]+)", attrs)
+
+def add_classes(attrs, classes):
+    """
+    Appends classes to a div's attribute block, like classes:insert in Lua.
+    """
+    extra = " ".join(f".{c}" for c in classes)
+    if not attrs.startswith("{"):
+        return f"{{.{attrs} {extra}}}"
+    inner = attrs[1:-1].strip()
+    return f"{{{inner} {extra}}}" if inner else f"{{{extra}}}"
+
+def take_div(lines, i):
+    """
+    Returns the index just past the fenced div opening at lines[i].
+    """
+    depth = 0
+    in_code = False
+    while i < len(lines):
+        line = lines[i]
+        if CODE_FENCE.match(line):
+            in_code = not in_code
+        elif not in_code:
+            if DIV_OPEN.match(line):
+                depth += 1
+            elif DIV_CLOSE.match(line):
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        i += 1
+    return i
+
+def split_blocks(lines):
+    """
+    Splits markdown lines into top-level blocks, roughly the way pandoc does:
+    blank lines separate paragraphs, an ATX heading is a block of its own,
+    and a fenced div, code block, HTML comment or whole list stays one block.
+    """
+    blocks = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+
+        start = i
+        if DIV_OPEN.match(line):
+            i = take_div(lines, i)
+        elif CODE_FENCE.match(line):
+            i += 1
+            while i < len(lines) and not CODE_FENCE.match(lines[i]):
+                i += 1
+            i += 1
+        elif line.lstrip().startswith("<!--"):
+            while i < len(lines) and "-->" not in lines[i]:
+                i += 1
+            i += 1
+        elif LIST_MARKER.match(line):
+            indent = len(LIST_MARKER.match(line).group(1))
+            i += 1
+            while i < len(lines):
+                nxt = lines[i]
+                if nxt.strip():
+                    marker = LIST_MARKER.match(nxt)
+                    continued = len(nxt) - len(nxt.lstrip()) > indent
+                    if not (continued or (marker and len(marker.group(1)) == indent)):
+                        # A lazy continuation line only counts right after an item line
+                        if lines[i - 1].strip() and not DIV_OPEN.match(nxt):
+                            i += 1
+                            continue
+                        break
+                else:
+                    # A blank line ends the list unless another item or indented text follows
+                    j = i
+                    while j < len(lines) and not lines[j].strip():
+                        j += 1
+                    if j == len(lines):
+                        break
+                    marker = LIST_MARKER.match(lines[j])
+                    if not ((marker and len(marker.group(1)) == indent)
+                            or len(lines[j]) - len(lines[j].lstrip()) > indent):
+                        break
+                i += 1
+        elif ATX_HEADING.match(line):
+            i += 1
+        else:
+            while i < len(lines) and lines[i].strip() and not DIV_OPEN.match(lines[i]) \
+                    and not (i > start and DIV_CLOSE.match(lines[i])):
+                i += 1
+        blocks.append(lines[start:i])
+    return blocks
+
+def expand_lines(lines):
+    """
+    Expands every auto-fragment div in `lines`, innermost first like the
+    pandoc filter walk.
+    """
+    out = []
+    i = 0
+    in_code = False
+    while i < len(lines):
+        line = lines[i]
+        if CODE_FENCE.match(line):
+            in_code = not in_code
+        match = None if in_code else DIV_OPEN.match(line)
+        if not match:
+            out.append(line)
+            i += 1
+            continue
+
+        end = take_div(lines, i)
+        body = expand_lines(lines[i + 1:end - 1])
+        fence, attrs = match.group(1), match.group(2)
+
+        if AUTO_CLASS not in div_classes(attrs):
+            out.append(line)
+            out.extend(body)
+            out.append(lines[end - 1])
+            i = end
+            continue
+
+        style_match = STYLE_ATTR.search(attrs)
+        style = style_match.group(1).strip("\"'") if style_match else DEFAULT_STYLE
+        attrs = STYLE_ATTR.sub("", attrs)
+
+        out.append(f"{fence} {attrs}")
+        for block in split_blocks(body):
+            child = DIV_OPEN.match(block[0])
+            if child:
+                out.append(f"{child.group(1)} {add_classes(child.group(2), ['fragment', style])}")
+                out.extend(block[1:])
+            else:
+                out.append(f"::: {{.fragment .{style}}}")
+                out.extend(block)
+                out.append(":::")
+            out.append("")
+        out.append(fence)
+        i = end
+    return out
+
+def drop_filter(lines):
+    """
+    Removes the auto-fragment.lua entry (and an emptied `filters:` key)
+    from the frontmatter.
+    """
+    if not lines or lines[0].strip() != "---":
+        return lines
+    end = next((i for i in range(1, len(lines)) if lines[i].strip() == "---"), None)
+    if end is None:
+        return lines
+
+    front = [l for l in lines[1:end] if not (l.strip().startswith("-") and FILTER_NAME in l)]
+    cleaned = []
+    for j, l in enumerate(front):
+        if l.strip() == "filters:":
+            indent = len(l) - len(l.lstrip())
+            rest = [r for r in front[j + 1:] if r.strip() and not r.lstrip().startswith("#")]
+            if not rest or len(rest[0]) - len(rest[0].lstrip()) <= indent \
+                    and not rest[0].lstrip().startswith("-"):
+                continue
+        cleaned.append(l)
+    return [lines[0]] + cleaned + lines[end:]
+
+def expand_source(text):
+    lines = drop_filter(text.splitlines())
+    return "\n".join(expand_lines(lines)) + "\n"
+
+def find_decks():
+    decks = []
+    for qmd in sorted(SLIDES_DIR.glob("*/*.qmd")):
+        if qmd.name.startswith("_"):
+            continue
+        if FILTER_NAME in qmd.read_text(encoding="utf-8"):
+            decks.append(qmd)
+    return decks
+
+def expanded_path(deck):
+    return deck.with_name(f"_{deck.stem}.prefragment.qmd")
+
+def prerender(deck, cache):
+    """
+    Writes the expanded copy of `deck` unless the cached one is current.
+    Returns True if it had to be regenerated.
+    """
+    text = deck.read_text(encoding="utf-8")
+    key = hashlib.sha256((TRANSFORM_VERSION + text).encode("utf-8")).hexdigest()
+    out = expanded_path(deck)
+    rel = deck.relative_to(SLIDES_DIR).as_posix()
+
+    if cache.get(rel) == key and out.exists():
+        return False
+
+    out.write_text(expand_source(text), encoding="utf-8")
+    cache[rel] = key
+    return True
+
+def quarto_render(path, output=None):
+    cmd = ["quarto", "render", str(path)]
+    if output:
+        cmd += ["--output", output]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def bench(decks, repeat):
+    print(f"{'deck':<32} {'lua filter':>12} {'pre-render':>12}")
+    total_lua = total_pre = 0.0
+    for deck in decks:
+        lua = min(quarto_render(deck) for _ in range(repeat))
+        pre = min(quarto_render(expanded_path(deck), f"{deck.stem}.html") for _ in range(repeat))
+        total_lua += lua
+        total_pre += pre
+        print(f"{deck.stem:<32} {lua:>11.2f}s {pre:>11.2f}s")
+    print(f"{'total':<32} {total_lua:>11.2f}s {total_pre:>11.2f}s")
+
+def pandoc_blocks(path, lua_filter=None):
+    """
+    The pandoc AST blocks of a deck, read the way quarto reads it.
+    """
+    cmd = ["quarto", "pandoc", path.name, "-f", "markdown", "-t", "json"]
+    if lua_filter:
+        cmd += ["--lua-filter", str(lua_filter)]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=path.parent)
+    return json.loads(result.stdout)["blocks"]
+
+def check(decks):
+    """
+    Compares each expanded copy with its deck run through the Lua filter.
+    Returns the number of decks that differ.
+    """
+    lua_filter = Path(__file__).resolve().parent / FILTER_NAME
+    failed = 0
+    for deck in decks:
+        expected = pandoc_blocks(deck, lua_filter)
+        actual = pandoc_blocks(expanded_path(deck))
+        if expected == actual:
+            print(f"[ok]      {deck.name}")
+            continue
+        failed += 1
+        first = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                     min(len(expected), len(actual)))
+        print(f"[differs] {deck.name}: top-level block {first} "
+              f"({len(expected)} blocks with the filter, {len(actual)} expanded)")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand auto-fragment divs in slide decks before rendering.")
+    parser.add_argument("decks", nargs="*", help="Deck .qmd files (default: every deck using the filter)")
+    parser.add_argument("--render", action="store_true", help="Render the expanded decks with quarto")
+    parser.add_argument("--bench", type=int, metavar="N", help="Compare render times over N runs")
+    parser.add_argument("--check", action="store_true",
+                        help="Check the expanded decks against the Lua filter with quarto pandoc")
+
+    args = parser.parse_args()
+
+    decks = [Path(d).resolve() for d in args.decks] or find_decks()
+
+    cache = {}
+    if CACHE_FILE.exists():
+        cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+
+    for deck in decks:
+        if prerender(deck, cache):
+            print(f"Expanded: {deck.name} -> {expanded_path(deck).name}")
+
+    CACHE_FILE.write_text(json.dumps(cache, indent=2) + "\n", encoding="utf-8")
+
+    if args.check:
+        failed = check(decks)
+        if failed:
+            print(f"Error: {failed} deck(s) differ from the Lua filter's output.")
+            sys.exit(1)
+    elif args.bench:
+        bench(decks, args.bench)
+    elif args.render:
+        for deck in decks:
+            quarto_render(expanded_path(deck), f"{deck.stem}.html")
+            print(f"Rendered: {deck.name}")
+
+if __name__ == "__main__":
+    main()
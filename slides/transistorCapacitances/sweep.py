@@ -0,0 +1,171 @@
+#%%
+
+# Parameter sweeps for the junction-capacitance and hybrid-pi models in test.py.
+#
+#   python sweep.py --V_be lin:-1:0.6:1000 --V_bi 0.6,0.7,0.8 --gm log:1e-3:1e-1:50 -o sweep.parquet
+#
+# Every parameter takes a scalar, a comma separated list, or lin:start:stop:num /
+# log:start:stop:num. The full cartesian product is evaluated in fixed-size
+# chunks and streamed to CSV, Parquet or NPZ, so memory stays bounded no
+# matter how many points the sweep has. numpy is imported where it's used, so
+# --help starts without it.
+import os
+import argparse
+import tempfile
+import zipfile
+
+# Defaults match the values used for the figures in test.py
+DEFAULTS = {
+    "Cje0": 10e-15,  # Base-Emitter Junction Capacitance at zero bias (F)
+    "V_bi": 0.7,     # Built-in potential (V)
+    "V_be": 0.0,     # Base-Emitter voltage (V)
+    "gm": 50e-3,     # Transconductance (S)
+    "ro": 10e3,      # Output Resistance (Ohm)
+    "rpi": 2.5e3,    # Input Resistance (Ohm)
+    "Cpi": 2.0e-12,  # Input Capacitance (F)
+    "Cmu": 0.5e-12,  # Feedback Capacitance (F)
+    "f": 1e9,        # Frequency at which the gains are evaluated (Hz)
+}
+PARAMS = list(DEFAULTS)
+CHUNK_SIZE = 1 << 20
+
+def junction_capacitance(Cje0, V_bi, V_be):
+    """
+    C_je = Cje0 / sqrt(1 - V_be / V_bi). NaN past the built-in potential.
+    """
+    import numpy as np
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return Cje0 / np.sqrt(1 - V_be / V_bi)
+
+def transition_frequency(gm, Cpi, Cmu):
+    """
+    Theoretical f_T = gm / (2 pi (Cpi + Cmu)).
+    """
+    import numpy as np
+    return gm / (2 * np.pi * (Cpi + Cmu))
+
+def hybrid_pi_gains(gm, ro, rpi, Cpi, Cmu, f):
+    """
+    Short-circuit current gain and open-circuit voltage gain in dB.
+    """
+    import numpy as np
+    s = 2j * np.pi * f
+    Ai_sc = (gm - s*Cmu)/(1/rpi + s*(Cmu + Cpi))
+    Av_oc = -gm * ro * (1 - s * (Cmu / gm)) / (1 + s * ro * Cmu)
+    return 20 * np.log10(np.abs(Ai_sc)), 20 * np.log10(np.abs(Av_oc))
+
+def evaluate(p):
+    """
+    Evaluates every model on a dict of equally sized parameter arrays.
+    """
+    Ai_sc_db, Av_oc_db = hybrid_pi_gains(p["gm"], p["ro"], p["rpi"], p["Cpi"], p["Cmu"], p["f"])
+    return {
+        "C_je": junction_capacitance(p["Cje0"], p["V_bi"], p["V_be"]),
+        "f_T": transition_frequency(p["gm"], p["Cpi"], p["Cmu"]),
+        "Ai_sc_db": Ai_sc_db,
+        "Av_oc_db": Av_oc_db,
+    }
+
+def parse_sweep(spec):
+    """
+    Parses "0.7", "0.6,0.7", "lin:-1:1:100" or "log:1e-3:1e-1:50" into an array.
+    """
+    import numpy as np
+    if spec.startswith(("lin:", "log:")):
+        kind, start, stop, num = spec.split(":")
+        start, stop, num = float(start), float(stop), int(num)
+        if kind == "lin":
+            return np.linspace(start, stop, num)
+        return np.logspace(np.log10(start), np.log10(stop), num)
+    return np.array([float(v) for v in spec.split(",")])
+
+def sweep_chunks(grids, chunk_size=CHUNK_SIZE):
+    """
+    Yields (params, outputs) dicts for the cartesian product of `grids`,
+    at most `chunk_size` points at a time.
+    """
+    import numpy as np
+    names = list(grids)
+    shape = tuple(len(grids[k]) for k in names)
+    total = int(np.prod(shape))
+    for start in range(0, total, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, total))
+        idx = np.unravel_index(flat, shape)
+        params = {k: grids[k][i] for k, i in zip(names, idx)}
+        yield params, evaluate(params)
+
+def write_csv(path, chunks):
+    import numpy as np
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, (params, outputs) in enumerate(chunks):
+            cols = {**params, **outputs}
+            if i == 0:
+                f.write(",".join(cols) + "\n")
+            np.savetxt(f, np.column_stack(list(cols.values())), delimiter=",", fmt="%.9g")
+
+def write_parquet(path, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for params, outputs in chunks:
+            table = pa.table({**params, **outputs})
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_npz(path, chunks, total):
+    # np.savez needs whole arrays, so each column is first filled into a
+    # memory-mapped .npy on disk and then copied into the zip file by file.
+    import numpy as np
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp:
+        columns = {}
+        offset = 0
+        for params, outputs in chunks:
+            cols = {**params, **outputs}
+            for k, v in cols.items():
+                if k not in columns:
+                    columns[k] = np.lib.format.open_memmap(
+                        os.path.join(tmp, f"{k}.npy"), mode='w+', dtype=np.float64, shape=(total,))
+                columns[k][offset:offset + len(v)] = v
+            offset += len(v)
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for k, arr in columns.items():
+                arr.flush()
+                zf.write(os.path.join(tmp, f"{k}.npy"), arcname=f"{k}.npy")
+        columns.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the junction-capacitance and hybrid-pi models.")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name}", default=repr(default), help=f"Sweep spec (default: {default})")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv, .parquet or .npz)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Points evaluated per chunk")
+
+    args = parser.parse_args()
+
+    import numpy as np
+
+    grids = {name: parse_sweep(getattr(args, name)) for name in PARAMS}
+    total = int(np.prod([len(g) for g in grids.values()]))
+    chunks = sweep_chunks(grids, args.chunk_size)
+
+    ext = os.path.splitext(args.output)[1].lower()
+    if ext == ".csv":
+        write_csv(args.output, chunks)
+    elif ext == ".parquet":
+        write_parquet(args.output, chunks)
+    elif ext == ".npz":
+        write_npz(args.output, chunks, total)
+    else:
+        print(f"Error: Unsupported output format '{ext}'.")
+        return
+
+    print(f"--- Completed. Wrote {total} points to {args.output}. ---")
+
+if __name__ == "__main__":
+    main()
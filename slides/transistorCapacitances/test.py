@@ -4,7 +4,6 @@
 import numpy as np
 import scipy.signal as signal
 import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 
 # --- Configuration & Parameters ---
 # Define system parameters to mimic the generic bandpass shape
@@ -182,7 +181,7 @@ import numpy as np
 
 import matplotlib.pyplot as plt
 
-
+from sweep import junction_capacitance
 
 Cje0 = 10e-15  # Base-Emitter Junction Capacitance at zero bias (F)
 
@@ -192,7 +191,7 @@ V_bi = 0.7  # Built-in potential (V)
 
 V_be = np.linspace(-1, 1, 100)  # Base-Emitter voltage (V)
 
-C_je = Cje0 / np.sqrt(1 - V_be / V_bi)  # Base-Emitter Junction Capacitance (F)
+C_je = junction_capacitance(Cje0, V_bi, V_be)  # Base-Emitter Junction Capacitance (F)
 
 
 
@@ -231,6 +230,8 @@ plt.savefig("figures/cje.svg", transparent=True)
 import numpy as np
 import matplotlib.pyplot as plt
 
+from sweep import transition_frequency, hybrid_pi_gains
+
 # ==========================================
 # 1. Define Transistor Parameters (Typical RF BJT/MOSFET values)
 # ==========================================
@@ -245,41 +246,31 @@ Av_intrinsic_dc = gm * ro
 Av_intrinsic_db = 20 * np.log10(Av_intrinsic_dc)
 
 # Theoretical fT calculation (for comparison)
-ft_theoretical = gm / (2 * np.pi * (Cpi + Cmu))
+ft_theoretical = transition_frequency(gm, Cpi, Cmu)
 
 # ==========================================
 # 2. Frequency Sweep Setup
 # ==========================================
 # From 100 kHz to 100 GHz
 f = np.logspace(5, 11, 500) 
-omega = 2 * np.pi * f
-s = 1j * omega
 
 # ==========================================
 # 3. Define Gain Equations based on Hybrid-Pi
 # ==========================================
 
 # --- A) Short-Circuit Current Gain (io / ii) ---
-# Output is shorted (vo = 0). Cmu appears in parallel with Cpi.
-# Zin_sc = rpi || (1 / s(Cpi + Cmu))
-C_total_in = Cpi + Cmu
-Zin_sc = rpi / (1 + s * rpi * C_total_in)
-# io approx gm * vpi (ignoring feedforward Cmu current for simplicity at fT)
-# vpi = ii * Zin_sc
-# Current Gain = io / ii = gm * Zin_sc
-Ai_sc = (gm - s*Cmu)/(1/rpi + s*(Cmu + Cpi))
-Ai_sc_db = 20 * np.log10(np.abs(Ai_sc))
-
+# Output is shorted (vo = 0). Cmu appears in parallel with Cpi, and the
+# feedforward current through Cmu is subtracted from gm * vpi:
+# Ai(s) = (gm - s*Cmu) / (1/rpi + s*(Cpi + Cmu))
 
 # --- B) Open-Circuit Voltage Gain (vo / vi) ---
 # Assuming ideal voltage source drive (Rs=0) and open output (RL=inf).
 # The bandwidth is limited by the output time constant (ro * Cmu).
 # Derived transfer function for open circuit Hybrid-Pi:
 # Av(s) = -gm*ro * (1 - s(Cmu/gm)) / (1 + s*ro*Cmu)
-Numerator = -gm * ro * (1 - s * (Cmu / gm))
-Denominator = (1 + s * ro * Cmu)
-Av_oc = Numerator / Denominator
-Av_oc_db = 20 * np.log10(np.abs(Av_oc))
+
+# Same formulas as the parameter sweep, so the figure and sweep.py agree
+Ai_sc_db, Av_oc_db = hybrid_pi_gains(gm, ro, rpi, Cpi, Cmu, f)
 
 
 # ==========================================